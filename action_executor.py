@@ -6,10 +6,207 @@ instructions to the "hands" (Windows client) via the relay server.
 """
 
 import asyncio
-from typing import List
-from datetime import datetime
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Sequence, Set, Union
 from controller_websocket import ControllerWebSocket
 from instruction_schema import Action, ActionResult
+from runtime import run
+
+logger = logging.getLogger(__name__)
+
+def _effective_delays(actions: Sequence[Action], respect_delays: bool = True) -> List[float]:
+    """Return how long to actually wait after each action.
+    
+    The delay after an action only matters if the next action depends on
+    it. Delays ahead of an independent action are deferred and coalesced,
+    so a run of independent actions is sent back to back and followed by a
+    single wait of the longest delay in the run.
+    """
+    if not respect_delays:
+        return [0.0] * len(actions)
+    
+    delays: List[float] = []
+    carried = 0.0
+    for i, action in enumerate(actions):
+        carried = max(carried, action.delay)
+        next_action = actions[i + 1] if i + 1 < len(actions) else None
+        if next_action is not None and not next_action.depends_on_previous:
+            delays.append(0.0)
+        else:
+            delays.append(carried)
+            carried = 0.0
+    return delays
+
+
+def _wants_screenshots(action: Action) -> bool:
+    """Whether an action's response will carry screenshot payloads."""
+    config = action.screenshot
+    return (config.before or config.after) and not config.deferred
+
+
+# Connection pool configuration
+POOL_SIZE = 1  # Idle connections kept per relay URL
+POOL_MAX_AGE = 300  # Seconds before an idle connection is retired
+RECONNECT_ATTEMPTS = 5  # Refill attempts per connection before giving up
+RECONNECT_BASE_DELAY = 0.5  # Seconds; doubles after each failed attempt
+
+
+class WsPool:
+    """Pool of idle, already-registered relay connections keyed by server URL.
+    
+    Acquiring from the pool skips the TCP/TLS/WebSocket handshake and the
+    controller registration round-trip. After each acquire a background
+    task tops the pool back up to ``size``, retrying with exponential
+    backoff, and an idle connection that drops is replaced the same way.
+    Connections older than ``max_age`` are closed instead of handed out.
+    
+    Idle connections are registered controllers, so the relay still sends
+    them client connect/disconnect notices; keep ``size`` small.
+    """
+    
+    def __init__(self, size: int = POOL_SIZE, max_age: float = POOL_MAX_AGE):
+        self.size = size
+        self.max_age = max_age
+        self._idle: Dict[str, Deque[ControllerWebSocket]] = {}
+        self._refills: Dict[str, asyncio.Task] = {}
+        # Strong references to the _watch tasks; the loop only keeps weak ones
+        self._watchers: Set[asyncio.Task] = set()
+        self._lock = asyncio.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    def _usable(self, controller: ControllerWebSocket) -> bool:
+        """Whether an idle connection is open and young enough to hand out."""
+        connected_at = controller.connected_at
+        return (controller.is_connected and connected_at is not None
+                and time.monotonic() - connected_at < self.max_age)
+    
+    def _check_loop(self):
+        """Forget connections left over from a previous event loop."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._idle.clear()
+            self._refills.clear()
+            self._watchers.clear()
+            self._lock = asyncio.Lock()
+    
+    async def _connect(self, server_url: str) -> ControllerWebSocket:
+        """Open and register a new controller connection."""
+        controller = ControllerWebSocket(server_url=server_url)
+        if not await controller.connect():
+            await controller.disconnect()
+            raise ConnectionError(f"Failed to register with relay at {server_url}")
+        watcher = asyncio.create_task(self._watch(controller))
+        self._watchers.add(watcher)
+        watcher.add_done_callback(self._watchers.discard)
+        return controller
+    
+    async def acquire(self, server_url: str) -> ControllerWebSocket:
+        """Return a healthy connection, reusing an idle one when possible."""
+        self._check_loop()
+        controller = None
+        stale = []
+        async with self._lock:
+            idle = self._idle.setdefault(server_url, deque())
+            while idle:
+                candidate = idle.popleft()
+                if self._usable(candidate):
+                    controller = candidate
+                    break
+                stale.append(candidate)
+        
+        for candidate in stale:
+            await candidate.disconnect()
+        
+        if controller is None:
+            controller = await self._connect(server_url)
+        
+        self._schedule_refill(server_url)
+        return controller
+    
+    async def release(self, controller: ControllerWebSocket):
+        """Return a connection to the pool, or close it if it can't be reused."""
+        self._check_loop()
+        async with self._lock:
+            idle = self._idle.setdefault(controller.server_url, deque())
+            if self._usable(controller) and len(idle) < self.size:
+                idle.append(controller)
+                return
+        await controller.disconnect()
+    
+    def _schedule_refill(self, server_url: str):
+        """Start a refill task for server_url unless one is already running."""
+        task = self._refills.get(server_url)
+        if task is None or task.done():
+            self._refills[server_url] = asyncio.create_task(self._refill(server_url))
+    
+    async def prewarm(self, server_url: str):
+        """Fill the idle bucket for server_url ahead of the first acquire."""
+        self._check_loop()
+        self._schedule_refill(server_url)
+        await self._refills[server_url]
+    
+    async def _connect_with_backoff(self, server_url: str) -> Optional[ControllerWebSocket]:
+        """Try to connect a few times with exponential backoff; None if all fail."""
+        delay = RECONNECT_BASE_DELAY
+        for attempt in range(1, RECONNECT_ATTEMPTS + 1):
+            try:
+                return await self._connect(server_url)
+            except Exception as e:
+                logger.warning("Pool connect to %s failed (attempt %d/%d): %s",
+                               server_url, attempt, RECONNECT_ATTEMPTS, e)
+            if attempt < RECONNECT_ATTEMPTS:
+                await asyncio.sleep(delay)
+                delay *= 2
+        return None
+    
+    async def _watch(self, controller: ControllerWebSocket):
+        """Replace an idle connection if the relay closes it."""
+        websocket = controller.websocket
+        if websocket is None:
+            return
+        await websocket.wait_closed()
+        async with self._lock:
+            idle = self._idle.get(controller.server_url)
+            if idle is None or controller not in idle:
+                return  # Handed out or already retired
+            idle.remove(controller)
+        logger.info("Pooled connection to %s closed; reconnecting", controller.server_url)
+        self._schedule_refill(controller.server_url)
+    
+    async def _refill(self, server_url: str):
+        """Open connections until the idle bucket for server_url is full."""
+        while len(self._idle.get(server_url, ())) < self.size:
+            controller = await self._connect_with_backoff(server_url)
+            if controller is None:
+                return
+            async with self._lock:
+                idle = self._idle.setdefault(server_url, deque())
+                full = len(idle) >= self.size
+                if not full:
+                    idle.append(controller)
+            if full:
+                # A released connection filled the slot meanwhile
+                await controller.disconnect()
+                return
+    
+    async def close(self):
+        """Close all idle connections and stop refilling and watching."""
+        for task in self._refills.values():
+            task.cancel()
+        self._refills.clear()
+        for task in list(self._watchers):
+            task.cancel()
+        async with self._lock:
+            idle = [c for bucket in self._idle.values() for c in bucket]
+            self._idle.clear()
+        for controller in idle:
+            await controller.disconnect()
+
+
+_GLOBAL_POOL = WsPool()
 
 
 class ActionExecutor:
@@ -40,7 +237,7 @@ class ActionExecutor:
         return await self.controller.list_clients()
     
     async def click_element(self, client_id: str, element: str, 
-                           screenshot: dict = None) -> ActionResult:
+                           screenshot: Union[dict, bool, None] = None) -> ActionResult:
         """Click a UI element by template name.
         
         Args:
@@ -49,66 +246,244 @@ class ActionExecutor:
             screenshot: Screenshot config, e.g.:
                         {"before": True, "after": True}
                         {"before": True, "after": False}
+                        {"deferred": True} (keep both on the client, see
+                        fetch_screenshot)
                         True (shorthand for both)
-                        False (shorthand for neither)
+                        False (shorthand for neither, the default)
         
         Returns:
             ActionResult with success status, coordinates, and screenshots
         """
         if screenshot is None:
-            screenshot = {"before": True, "after": True}
+            screenshot = {"before": False, "after": False}
         
         action = Action(element, screenshot=screenshot)
-        command = action.to_command()
+        return await self._run_action(client_id, action)
+    
+    async def fetch_screenshot(self, client_id: str, ref: str,
+                               release: bool = False) -> Optional[Union[bytes, str]]:
+        """Fetch a screenshot by ref (e.g. ``ActionResult.before_ref``).
+        
+        Screenshots this controller already received are served from its
+        cache; deferred ones are requested from the client, which keeps the
+        most recent captures. Pass ``release=True`` when the screenshot will
+        not be needed again so the client frees it.
+        
+        Returns:
+            PNG bytes (base64 str over JSON-only transport), or None if the
+            client no longer holds the screenshot
+        """
+        response = await self.controller.get_screenshot(client_id, ref, release)
+        if response.get('status') != 'success':
+            logger.warning("Screenshot %s unavailable: %s", ref, response.get('message'))
+            return None
+        return response['data']['screenshot']
+    
+    async def _run_action(self, client_id: str, action: Action) -> ActionResult:
+        """Send a single action and wait for its result."""
+        command = action.to_json()  # Serialized once per Action, not per send
         
-        start_time = datetime.now()
+        start_time = time.perf_counter()
         response = await self.controller.send_command(client_id, command)
-        execution_time = (datetime.now() - start_time).total_seconds()
+        execution_time = time.perf_counter() - start_time
         
         result = ActionResult.from_response(response, action)
         result.execution_time = execution_time
         
         return result
     
-    async def execute_sequence(self, client_id: str, 
-                              actions: List[Action]) -> List[ActionResult]:
+    @staticmethod
+    def _failed_result(action: Action, error: str) -> ActionResult:
+        """Create a failed ActionResult for an action that got no response."""
+        logger.warning("Action failed for %s: %s", action.element, error)
+        return ActionResult(success=False, action=action, error=error)
+    
+    async def execute_sequence(self, client_id: str, actions: Sequence[Action],
+                              max_in_flight: Optional[int] = None,
+                              respect_delays: bool = True) -> List[ActionResult]:
         """Execute a sequence of actions.
         
+        By default the whole sequence is shipped to the client as a single
+        batch; the client runs the actions in order, honors each action's
+        delay locally and streams back one result per action.
+        
+        With ``max_in_flight`` set, actions are instead sent as individual
+        commands with up to that many awaiting a response at once. An action
+        with a non-zero delay acts as a barrier: everything up to it must
+        complete before the delay starts and later actions are sent.
+        
+        Delays ahead of actions marked ``depends_on_previous=False`` are
+        coalesced into one wait after the run of independent actions.
+        
         Args:
             client_id: Target client ID
-            actions: List of Action objects
+            actions: Sequence of Action objects
+            max_in_flight: Submission window for pipelined execution
+            respect_delays: If False, skip all delays between actions
         
         Returns:
-            List of ActionResult objects
+            List of ActionResult objects, in the same order as ``actions``
         """
-        results = []
+        if not actions:
+            return []
         
-        for action in actions:
-            try:
-                result = await self.click_element(
-                    client_id, 
-                    action.element, 
-                    action.screenshot.to_dict()
-                )
-                results.append(result)
-            except (TimeoutError, Exception) as e:
-                # Create a failed ActionResult for this action
-                error_result = ActionResult(
-                    success=False,
-                    action=action,  # Pass the Action object, not just element string
-                    clicked_at=None,
-                    before_screenshot=None,
-                    after_screenshot=None,
-                    error=str(e),
-                    execution_time=0.0
-                )
-                results.append(error_result)
-                print(f"⚠️  Action failed for {action.element}: {e}")
-                print(f"   Continuing with next action...")
+        delays = _effective_delays(actions, respect_delays)
+        if max_in_flight is not None:
+            return await self._execute_pipelined(client_id, actions, delays, max_in_flight)
+        return await self._execute_batch(client_id, actions, delays)
+    
+    async def execute_bulk(self, client_id: str, actions: Sequence[Action],
+                           respect_delays: bool = True) -> List[ActionResult]:
+        """Execute a sequence, answering screenshot-free runs with one reply each.
+        
+        Consecutive actions that capture no screenshots are sent as a bulk
+        batch that the client answers with a single frame once the run is
+        done, instead of one frame per action. Actions that do capture
+        screenshots are streamed as in ``execute_sequence``.
+        
+        All runs are sent up front; the client queues them and runs them
+        back to back, so there is no round-trip between runs.
+        
+        Args:
+            client_id: Target client ID
+            actions: Sequence of Action objects
+            respect_delays: If False, skip all delays between actions
+        
+        Returns:
+            List of ActionResult objects, in the same order as ``actions``
+        """
+        delays = _effective_delays(actions, respect_delays)
+        runs: List[asyncio.Task] = []
+        previous: Optional[asyncio.Task] = None
+        start = 0
+        while start < len(actions):
+            bulk = not _wants_screenshots(actions[start])
+            end = start + 1
+            while end < len(actions) and _wants_screenshots(actions[end]) != bulk:
+                end += 1
+            
+            # Tasks send their batch frames in creation order; each only starts
+            # timing its results once the run ahead of it has completed
+            run, run_delays = actions[start:end], delays[start:end]
+            if bulk:
+                previous = asyncio.create_task(self._execute_bulk_run(client_id, run, run_delays, previous))
+            else:
+                previous = asyncio.create_task(self._execute_batch(client_id, run, run_delays, previous))
+            runs.append(previous)
+            start = end
+        
+        results: List[ActionResult] = []
+        for run_results in await asyncio.gather(*runs):
+            results.extend(run_results)
+        return results
+    
+    async def _execute_bulk_run(self, client_id: str, actions: Sequence[Action], delays: List[float],
+                                after: Optional[asyncio.Task] = None) -> List[ActionResult]:
+        """Execute a run of actions as one batch with a single bulk reply.
+        
+        ``after`` is the run queued ahead of this one on the client, if any.
+        """
+        ops = [action.to_batch_command(delay) for action, delay in zip(actions, delays)]
+        responses: List[Optional[Dict[str, Any]]] = [None] * len(actions)
+        error = f"Timeout waiting for response from {client_id}"
+        
+        try:
+            replies = await self.controller.send_bulk(client_id, ops, after)
+            for seq, message in enumerate(replies[:len(actions)]):
+                responses[seq] = message
+        except Exception as e:
+            error = str(e)
+        
+        results: List[ActionResult] = []
+        for action, response in zip(actions, responses):
+            if response is None:
+                results.append(self._failed_result(action, error))
+                continue
+            
+            # The client times each op itself; there is no per-op arrival to measure
+            result = ActionResult.from_response(response, action)
+            result.execution_time = response.get('execution_time', 0.0)
+            results.append(result)
+        
+        if delays[-1] > 0:
+            await asyncio.sleep(delays[-1])
+        
+        return results
+    
+    async def _execute_batch(self, client_id: str, actions: Sequence[Action], delays: List[float],
+                             after: Optional[asyncio.Task] = None) -> List[ActionResult]:
+        """Execute a sequence as one batch frame with streamed results.
+        
+        ``after`` is the run queued ahead of this one on the client, if any.
+        """
+        ops = [action.to_batch_command(delay) for action, delay in zip(actions, delays)]
+        responses: List[Optional[Dict[str, Any]]] = [None] * len(actions)
+        execution_times: List[float] = [0.0] * len(actions)
+        error = f"Timeout waiting for response from {client_id}"
+        
+        try:
+            # Results arrive back to back; subtract the client-side delay
+            # of the previous action to get each action's own execution time
+            last_time = time.perf_counter()
+            previous_delay = 0.0
+            
+            async def started(previous_run: asyncio.Task):
+                # The client starts this batch once the run ahead of it is done
+                nonlocal last_time
+                await previous_run
+                last_time = time.perf_counter()
+            
+            ready = started(after) if after is not None else None
+            async for seq, message in self.controller.stream_batch(client_id, ops, ready):
+                now = time.perf_counter()
+                responses[seq] = message
+                execution_times[seq] = max(now - last_time - previous_delay, 0.0)
+                last_time = now
+                previous_delay = delays[seq]
+        except Exception as e:
+            error = str(e)
+        
+        results: List[ActionResult] = []
+        for action, response, execution_time in zip(actions, responses, execution_times):
+            if response is None:
+                results.append(self._failed_result(action, error))
+                continue
+            
+            result = ActionResult.from_response(response, action)
+            result.execution_time = execution_time
+            results.append(result)
+        
+        # The client only waits between actions; keep the delay after the last one
+        if delays[-1] > 0:
+            await asyncio.sleep(delays[-1])
+        
+        return results
+    
+    async def _execute_pipelined(self, client_id: str, actions: Sequence[Action],
+                                 delays: List[float], max_in_flight: int) -> List[ActionResult]:
+        """Execute a sequence with a bounded number of commands in flight."""
+        window = asyncio.Semaphore(max_in_flight)
+        
+        async def submit(action: Action) -> ActionResult:
+            async with window:
+                try:
+                    return await self._run_action(client_id, action)
+                except Exception as e:
+                    return self._failed_result(action, str(e))
+        
+        results: List[ActionResult] = []
+        pending: List[Action] = []
+        for action, delay in zip(actions, delays):
+            pending.append(action)
             
             # Wait before next action
-            if action.delay > 0:
-                await asyncio.sleep(action.delay)
+            if delay > 0:
+                results.extend(await asyncio.gather(*[submit(a) for a in pending]))
+                pending = []
+                await asyncio.sleep(delay)
+        
+        if pending:
+            results.extend(await asyncio.gather(*[submit(a) for a in pending]))
         
         return results
 
@@ -117,15 +492,19 @@ class ActionExecutor:
 class ActionExecutorContext:
     """Context manager for ActionExecutor."""
     
-    def __init__(self, server_url: str):
+    def __init__(self, server_url: str, pool: Optional[WsPool] = None):
         self.executor = ActionExecutor(server_url)
+        self.pool = pool or _GLOBAL_POOL
     
     async def __aenter__(self):
-        await self.executor.connect()
+        # Take a pre-warmed connection instead of handshaking from scratch
+        self.executor.controller = await self.pool.acquire(self.executor.server_url)
+        self.executor.connected = True
         return self.executor
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        await self.executor.disconnect()
+        await self.pool.release(self.executor.controller)
+        self.executor.connected = False
 
 
 # Example usage
@@ -150,4 +529,4 @@ if __name__ == '__main__':
                 
                 print(result)
     
-    asyncio.run(main())
+    run(main())
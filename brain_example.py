@@ -10,23 +10,168 @@ The brain doesn't need to know about coordinates - it just says
 """
 
 import asyncio
-import base64
+import binascii
+import sys
+from functools import partial
 from datetime import datetime
+from typing import Union
 from action_executor import ActionExecutorContext
 from instruction_schema import Action
+from runtime import run
+
+try:
+    import pybase64
+    _b64decode = partial(pybase64.b64decode, validate=True)  # SIMD-accelerated
+except ImportError:
+    _b64decode = binascii.a2b_base64
+try:
+    import aiofiles
+    AIOFILES_AVAILABLE = True
+except ImportError:
+    AIOFILES_AVAILABLE = False
 
 
 # Configuration
 SERVER_URL = 'ws://34.63.226.183:8765'  # Update with your server URL
+VERBOSE = False  # Print a line per saved screenshot (--verbose)
+FAST = False  # Skip the delays between actions (--fast)
+SKIP_UNCHANGED = True  # Don't save a screenshot identical to the one saved just before it
+
+# Base64 is decoded on a worker thread, in slices so the event loop gets the
+# GIL back between them; a process pool would pickle every multi-MB string
+DECODE_CHUNK = 256 * 1024  # base64 chars per slice; a multiple of 4 so slices decode independently
+
+
+# Sequence of actions for main(), built once at import
+# Each action specifies:
+# - element: template name (must match filename in templates/ folder)
+# - screenshot: when to capture screenshots
+# - delay: how long to wait after this action
+# - index: which match to click if template appears multiple times (0-based, optional)
+ACTIONS = (
+    # Row 1 - Chart 1 templates
+    # Action("chart1_e200", screenshot=False, delay=1.0),
+    # Action("chart1_e400", screenshot=False, delay=1.0),
+    # Action("chart1_enh200", screenshot=False, delay=0.5),
+    # Action("chart1_eweme20", screenshot=False, delay=0.5),
+    # Action("chart1_hbv100", screenshot=False, delay=0.5),
+    # Action("chart1_m800", screenshot=False, delay=0.3),
+    # Action("chart1_mew100", screenshot=False, delay=0.3),
+    # Action("chart1_tzvec20", screenshot=False, delay=0.3),
+    # Action("chart1_vlnea70", screenshot=False, delay=0.3),
+    # Action("chart1_w150", screenshot=False, delay=0.3),
+    # Action("chart1_w400", screenshot=False, delay=0.3),
+    # Action("chart1_wemew40", screenshot=False, delay=0.3),
+    # Action("chart1_wemew70", screenshot=False, delay=1.0),
+
+    # Left/Right eye templates with offset to click number fields
+    # Match the static label (e.g., "ADD") and click the number field to the left/right
+    # Negative X offset = click to the left, Positive X offset = click to the right
+    Action("right_add", screenshot=False, delay=1.0, offset=(-100, 0)),  # Click 100px left of "ADD" label
+    Action("right_axial", screenshot=False, delay=1.0, offset=(-100, 0)),
+    Action("right_spherical", screenshot=False, delay=1.0, offset=(-100, 0)),
+    Action("right_cylindrical", screenshot=False, delay=1.0, offset=(-100, 0)),
+    Action("left_add", screenshot=False, delay=1.0, offset=(100, 0)),  # Click 100px right of "ADD" label
+    Action("left_axial", screenshot=False, delay=1.0, offset=(100, 0)),
+    Action("left_spherical", screenshot=False, delay=1.0, offset=(100, 0)),
+    Action("left_cylindrical", screenshot=False, delay=1.0, offset=(100, 0)),
+
+    # Navigation arrows - demonstrates using index for multiple matches
+    # If navigate_chart_arrows has left/right arrows, use index to select which one
+    # Action("navigate_chart_arrows", screenshot=False, delay=0.5, index=0),  # Click first (left) arrow
+    # Action("navigate_chart_arrows", screenshot=False, delay=0.5, index=1),  # Click second (right) arrow
+
+    # Chart selection - top 5 buttons (vertical layout)
+    # Action("chart_top_5", screenshot=False, delay=0.5, index=0),  # Click topmost chart
+    # Action("chart_top_5", screenshot=False, delay=0.5, index=2),  # Click middle chart
+    # Action("chart_top_5", screenshot=False, delay=0.5, index=4),  # Click bottom chart
+
+    # Chart selection - right 3 buttons (horizontal layout)
+    # Action("chart_right_3", screenshot=False, delay=0.5, index=0),  # Click leftmost
+    # Action("chart_right_3", screenshot=False, delay=0.5, index=1),  # Click middle
+    # Action("chart_right_3", screenshot=False, delay=0.5, index=2),  # Click rightmost
+
+    # Occlusion controls - left/right
+    # Action("occlusion_l_r", screenshot=False, delay=0.5, index=0),  # Click left occlusion
+    # Action("occlusion_l_r", screenshot=False, delay=0.5, index=1),  # Click right occlusion
+
+    # PD value setter
+    # Action("set_pd_value", screenshot=False, delay=0.5),
+
+    # Tab navigation
+    # Action("tab_chart2", screenshot=False, delay=0.5),
+
+    # Right-click examples (useful for context menus)
+    # Action("chart1_e200", screenshot=False, delay=0.5, button='right'),  # Right-click on chart
+
+    # Middle-click examples (if needed)
+    # Action("some_element", screenshot=False, delay=0.5, button='middle'),
+)
+
+
+def _decode_and_write(screenshot: Union[bytes, str], filename: str):
+    """Decode a base64 screenshot if needed and write it to file (blocking).
+    
+    Base64 is decoded slice by slice straight into the file, so only one
+    DECODE_CHUNK is ever held decoded instead of the whole image.
+    """
+    with open(filename, 'wb') as f:
+        if isinstance(screenshot, str):
+            for start in range(0, len(screenshot), DECODE_CHUNK):
+                f.write(_b64decode(screenshot[start:start + DECODE_CHUNK]))
+        else:
+            f.write(screenshot)
+
+
+async def save_screenshot(screenshot: Union[bytes, str], filename: str):
+    """Save a screenshot to file (raw PNG bytes, or base64 from JSON-only transport).
+    
+    Base64 payloads are decoded and written on a worker thread; raw bytes
+    are written with aiofiles (or the same thread without it). Either way
+    the event loop keeps servicing the WebSocket meanwhile.
+    """
+    if screenshot:
+        if isinstance(screenshot, bytes) and AIOFILES_AVAILABLE:
+            async with aiofiles.open(filename, 'wb') as f:
+                await f.write(screenshot)
+        else:
+            await asyncio.to_thread(_decode_and_write, screenshot, filename)
+        if VERBOSE:
+            print(f"   💾 Saved: {filename}")
 
 
-async def save_screenshot(screenshot_b64: str, filename: str):
-    """Save base64 screenshot to file."""
-    if screenshot_b64:
-        img_data = base64.b64decode(screenshot_b64)
-        with open(filename, 'wb') as f:
-            f.write(img_data)
-        print(f"   💾 Saved: {filename}")
+def _unchanged(ref, last_ref) -> bool:
+    """Whether a screenshot is identical to the previous one (same SHA-256 ref)."""
+    if SKIP_UNCHANGED and ref is not None and ref == last_ref:
+        if VERBOSE:
+            print("   💾 Unchanged, not saved")
+        return True
+    return False
+
+
+async def save_screenshot_refs(executor, client_id: str, refs: list):
+    """Fetch deferred screenshots one at a time and save them.
+    
+    Results only carry refs, so at most two screenshots are held in memory:
+    each one is written while the next is fetched. Each is released on the
+    client after its last use (identical captures share a ref).
+    
+    Args:
+        refs: (ref, filename) pairs
+    """
+    if SKIP_UNCHANGED:
+        refs = [pair for i, pair in enumerate(refs) if i == 0 or pair[0] != refs[i - 1][0]]
+    last_use = {ref: i for i, (ref, _) in enumerate(refs)}
+    saving = None
+    for i, (ref, filename) in enumerate(refs):
+        fetch = executor.fetch_screenshot(client_id, ref, release=last_use[ref] == i)
+        if saving is None:
+            screenshot = await fetch
+        else:
+            _, screenshot = await asyncio.gather(saving, fetch)
+        saving = save_screenshot(screenshot, filename)
+    if saving is not None:
+        await saving
 
 
 async def verify_click_result(result, template_name: str) -> dict:
@@ -45,8 +190,8 @@ async def verify_click_result(result, template_name: str) -> dict:
         'clicked_at': result.clicked_at,
         'execution_time': result.execution_time,
         'error': result.error,
-        'has_before_screenshot': result.before_screenshot is not None,
-        'has_after_screenshot': result.after_screenshot is not None
+        'has_before_screenshot': result.before_screenshot is not None or result.before_ref is not None,
+        'has_after_screenshot': result.after_screenshot is not None or result.after_ref is not None
     }
     
     if result.success:
@@ -87,43 +232,47 @@ async def test_left_right_templates(executor, client_id: str):
         "left_cylindrical",
     ]
     
-    # Create actions with screenshots enabled for verification
+    # Create actions with screenshots enabled for verification; they stay on
+    # the client until saved, so results only carry refs
     actions = [
-        Action(template, screenshot=True, delay=1.0)
+        Action(template, screenshot={"before": True, "after": True, "deferred": True}, delay=1.0)
         for template in templates_to_test
     ]
     
     print(f"Testing {len(templates_to_test)} templates...\n")
     
     # Execute actions and collect results
-    results = await executor.execute_sequence(client_id, actions)
+    results = await executor.execute_sequence(client_id, actions, respect_delays=not FAST)
     
-    # Verify each result
+    # Verify each result; screenshots are fetched and saved at the end
     verifications = []
+    refs = []
     for i, (result, template_name) in enumerate(zip(results, templates_to_test), 1):
         verification = await verify_click_result(result, template_name)
         verifications.append(verification)
         
-        # Print verification status
+        # Print verification status in a single write
         status = "✓" if verification['success'] else "✗"
-        print(f"{status} Test {i}/{len(templates_to_test)}: {template_name}")
-        print(f"   {verification['message']}")
+        lines = [
+            f"{status} Test {i}/{len(templates_to_test)}: {template_name}",
+            f"   {verification['message']}",
+        ]
         
         if verification['success']:
-            print(f"   Execution time: {verification['execution_time']:.2f}s")
+            lines.append(f"   Execution time: {verification['execution_time']:.2f}s")
             
             # Save screenshots for verification
-            if result.before_screenshot:
-                filename = f"screenshots/test_{template_name}_before.png"
-                await save_screenshot(result.before_screenshot, filename)
+            if result.before_ref:
+                refs.append((result.before_ref, f"screenshots/test_{template_name}_before.png"))
             
-            if result.after_screenshot:
-                filename = f"screenshots/test_{template_name}_after.png"
-                await save_screenshot(result.after_screenshot, filename)
+            if result.after_ref:
+                refs.append((result.after_ref, f"screenshots/test_{template_name}_after.png"))
         else:
-            print(f"   Error: {verification['error']}")
+            lines.append(f"   Error: {verification['error']}")
         
-        print()
+        sys.stdout.write("\n".join(lines) + "\n\n")
+    
+    await save_screenshot_refs(executor, client_id, refs)
     
     # Summary
     successful = sum(1 for v in verifications if v['success'])
@@ -168,13 +317,15 @@ async def test_single_template(executor, client_id: str, template_name: str,
         print(f"   Execution time: {verification['execution_time']:.2f}s")
         
         # Save screenshots
+        saves = []
         if result.before_screenshot:
             filename = f"screenshots/single_{template_name}_before.png"
-            await save_screenshot(result.before_screenshot, filename)
+            saves.append(save_screenshot(result.before_screenshot, filename))
         
-        if result.after_screenshot:
+        if result.after_screenshot and not _unchanged(result.after_ref, result.before_ref):
             filename = f"screenshots/single_{template_name}_after.png"
-            await save_screenshot(result.after_screenshot, filename)
+            saves.append(save_screenshot(result.after_screenshot, filename))
+        await asyncio.gather(*saves)
     else:
         print(f"   Error: {verification['error']}")
     
@@ -190,72 +341,6 @@ async def main():
     print("=" * 70)
     print(f"\nServer: {SERVER_URL}\n")
     
-    # Define the sequence of actions using available templates
-    # Each action specifies:
-    # - element: template name (must match filename in templates/ folder)
-    # - screenshot: when to capture screenshots
-    # - delay: how long to wait after this action
-    # - index: which match to click if template appears multiple times (0-based, optional)
-    actions = [
-        # Row 1 - Chart 1 templates
-        # Action("chart1_e200", screenshot=False, delay=1.0),
-        # Action("chart1_e400", screenshot=False, delay=1.0),
-        # Action("chart1_enh200", screenshot=False, delay=0.5),
-        # Action("chart1_eweme20", screenshot=False, delay=0.5),
-        # Action("chart1_hbv100", screenshot=False, delay=0.5),
-        # Action("chart1_m800", screenshot=False, delay=0.3),
-        # Action("chart1_mew100", screenshot=False, delay=0.3),
-        # Action("chart1_tzvec20", screenshot=False, delay=0.3),
-        # Action("chart1_vlnea70", screenshot=False, delay=0.3),
-        # Action("chart1_w150", screenshot=False, delay=0.3),
-        # Action("chart1_w400", screenshot=False, delay=0.3),
-        # Action("chart1_wemew40", screenshot=False, delay=0.3),
-        # Action("chart1_wemew70", screenshot=False, delay=1.0),
-        
-        # Left/Right eye templates with offset to click number fields
-        # Match the static label (e.g., "ADD") and click the number field to the left/right
-        # Negative X offset = click to the left, Positive X offset = click to the right
-        Action("right_add", screenshot=False, delay=1.0, offset=(-100, 0)),  # Click 100px left of "ADD" label
-        Action("right_axial", screenshot=False, delay=1.0, offset=(-100, 0)),
-        Action("right_spherical", screenshot=False, delay=1.0, offset=(-100, 0)),
-        Action("right_cylindrical", screenshot=False, delay=1.0, offset=(-100, 0)),
-        Action("left_add", screenshot=False, delay=1.0, offset=(100, 0)),  # Click 100px right of "ADD" label
-        Action("left_axial", screenshot=False, delay=1.0, offset=(100, 0)),
-        Action("left_spherical", screenshot=False, delay=1.0, offset=(100, 0)),
-        Action("left_cylindrical", screenshot=False, delay=1.0, offset=(100, 0)),
-        
-        # Navigation arrows - demonstrates using index for multiple matches
-        # If navigate_chart_arrows has left/right arrows, use index to select which one
-        # Action("navigate_chart_arrows", screenshot=False, delay=0.5, index=0),  # Click first (left) arrow
-        # Action("navigate_chart_arrows", screenshot=False, delay=0.5, index=1),  # Click second (right) arrow
-        
-        # Chart selection - top 5 buttons (vertical layout)
-        # Action("chart_top_5", screenshot=False, delay=0.5, index=0),  # Click topmost chart
-        # Action("chart_top_5", screenshot=False, delay=0.5, index=2),  # Click middle chart
-        # Action("chart_top_5", screenshot=False, delay=0.5, index=4),  # Click bottom chart
-        
-        # Chart selection - right 3 buttons (horizontal layout)
-        # Action("chart_right_3", screenshot=False, delay=0.5, index=0),  # Click leftmost
-        # Action("chart_right_3", screenshot=False, delay=0.5, index=1),  # Click middle
-        # Action("chart_right_3", screenshot=False, delay=0.5, index=2),  # Click rightmost
-        
-        # Occlusion controls - left/right
-        # Action("occlusion_l_r", screenshot=False, delay=0.5, index=0),  # Click left occlusion
-        # Action("occlusion_l_r", screenshot=False, delay=0.5, index=1),  # Click right occlusion
-        
-        # PD value setter
-        # Action("set_pd_value", screenshot=False, delay=0.5),
-        
-        # Tab navigation
-        # Action("tab_chart2", screenshot=False, delay=0.5),
-        
-        # Right-click examples (useful for context menus)
-        # Action("chart1_e200", screenshot=False, delay=0.5, button='right'),  # Right-click on chart
-        
-        # Middle-click examples (if needed)
-        # Action("some_element", screenshot=False, delay=0.5, button='middle'),
-    ]
-    
     try:
         # Connect to server and execute actions
         async with ActionExecutorContext(SERVER_URL) as executor:
@@ -284,52 +369,59 @@ async def main():
                 (700, 700),
             ]
             
-            for i, (x, y) in enumerate(test_positions, 1):
-                try:
-                    response = await executor.controller.send_command(client_id, {
-                        'action': 'move_cursor',
-                        'x': x,
-                        'y': y
-                    })
-                    if response.get('status') == 'success':
+            try:
+                responses = await executor.controller.move_cursor_batch(
+                    client_id, test_positions, interval_ms=500
+                )
+                for (x, y), response in zip(test_positions, responses):
+                    if response is None:
+                        print(f"  ✗ No response for move to ({x}, {y})")
+                    elif response.get('status') == 'success':
                         print(f"  ✓ Moved to ({x}, {y})")
                     else:
                         print(f"  ✗ Failed to move to ({x}, {y}): {response.get('message')}")
-                    await asyncio.sleep(0.5)
-                except Exception as e:
-                    print(f"  ✗ Error moving to ({x}, {y}): {e}")
+            except Exception as e:
+                print(f"  ✗ Error moving cursor: {e}")
             
             print("\n✓ Mouse movement test complete!\n")
             
             # Execute the sequence
-            print(f"Executing {len(actions)} template-based actions...\n")
-            results = await executor.execute_sequence(client_id, actions)
+            print(f"Executing {len(ACTIONS)} template-based actions...\n")
+            # Screenshot-free runs come back as one reply each instead of one per action
+            results = await executor.execute_bulk(client_id, ACTIONS, respect_delays=not FAST)
             
             # Process results
             print("\n" + "=" * 70)
             print("Results")
             print("=" * 70 + "\n")
             
+            saves = []
+            last_ref = None
             for i, result in enumerate(results, 1):
                 status = "✓" if result.success else "✗"
-                print(f"{status} Action {i}: {result.action.element}")
+                lines = [f"{status} Action {i}: {result.action.element}"]
                 
                 if result.success:
-                    print(f"   Clicked at: {result.clicked_at}")
-                    print(f"   Execution time: {result.execution_time:.2f}s")
+                    lines.append(f"   Clicked at: {result.clicked_at}")
+                    lines.append(f"   Execution time: {result.execution_time:.2f}s")
                     
-                    # Save screenshots
-                    if result.before_screenshot:
+                    # Save screenshots, skipping ones identical to the last saved
+                    if result.before_screenshot and not _unchanged(result.before_ref, last_ref):
                         filename = f"screenshots/brain_{i}_before.png"
-                        await save_screenshot(result.before_screenshot, filename)
+                        saves.append(save_screenshot(result.before_screenshot, filename))
+                        last_ref = result.before_ref
                     
-                    if result.after_screenshot:
+                    if result.after_screenshot and not _unchanged(result.after_ref, last_ref):
                         filename = f"screenshots/brain_{i}_after.png"
-                        await save_screenshot(result.after_screenshot, filename)
+                        saves.append(save_screenshot(result.after_screenshot, filename))
+                        last_ref = result.after_ref
                 else:
-                    print(f"   Error: {result.error}")
+                    lines.append(f"   Error: {result.error}")
                 
-                print()
+                sys.stdout.write("\n".join(lines) + "\n\n")
+            
+            # Screenshot saves are independent; write them all concurrently
+            await asyncio.gather(*saves)
             
             # Summary
             successful = sum(1 for r in results if r.success)
@@ -395,13 +487,15 @@ async def test_only_left_right_templates():
 if __name__ == '__main__':
     # Create screenshots directory
     import os
-    import sys
     os.makedirs('screenshots', exist_ok=True)
     
+    VERBOSE = '--verbose' in sys.argv
+    FAST = '--fast' in sys.argv
+    
     # Check if user wants to test only left/right templates
-    if len(sys.argv) > 1 and sys.argv[1] == '--test-left-right':
+    if '--test-left-right' in sys.argv:
         # Run only left/right templates test
-        asyncio.run(test_only_left_right_templates())
+        run(test_only_left_right_templates())
     else:
         # Run the full brain example
-        asyncio.run(main())
+        run(main())
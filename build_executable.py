@@ -3,6 +3,13 @@
 Build MyOptum Installer - Package Windows client as standalone .exe
 
 This script uses PyInstaller to create the MyOptum Activity Monitor executable.
+
+PyInstaller's build/ directory is kept between runs so unchanged analysis
+(OpenCV, NumPy) is reused; pass --clean for a from-scratch build.
+
+The release is a folder (--onedir), shipped as dist/MyOptum_Installer.zip:
+unlike a --onefile exe it doesn't unpack OpenCV to a temp dir on every
+launch. Pass --onefile for a single self-extracting executable instead.
 """
 
 import os
@@ -14,8 +21,13 @@ import shutil
 VERSION = "0.0.10"
 
 
-def build_myoptum_installer():
-    """Build the MyOptum Installer executable using PyInstaller."""
+def build_myoptum_installer(clean: bool = False, onefile: bool = False):
+    """Build the MyOptum Installer executable using PyInstaller.
+    
+    Args:
+        clean: Discard PyInstaller's build cache and rebuild everything
+        onefile: Build a single executable instead of a zipped folder
+    """
     
     print("=" * 60)
     print(f"Building MyOptum Installer v{VERSION}")
@@ -39,26 +51,23 @@ def build_myoptum_installer():
     
     print("\n[OK] Source file found: windows_client_websocket.py")
     
-    # Clean previous builds
+    # Clean previous output; build/ is PyInstaller's cache and only goes with --clean
+    # (the spec file is regenerated from the command line on every run)
     print("\nCleaning previous builds...")
-    for directory in ['build', 'dist', '__pycache__']:
+    directories = ['build', 'dist', '__pycache__'] if clean else ['dist']
+    for directory in directories:
         if os.path.exists(directory):
             shutil.rmtree(directory)
             print(f"  Removed {directory}/")
     
-    # Remove old spec files
-    for spec_file in ['MyOptum_Installer.spec', 'windows_client_websocket.spec']:
-        if os.path.exists(spec_file):
-            os.remove(spec_file)
-            print(f"  Removed {spec_file}")
-    
     # PyInstaller command for MyOptum Installer
     print("\nBuilding MyOptum Installer with PyInstaller...")
     print("This may take a few minutes...\n")
     
     cmd = [
         'pyinstaller',
-        '--onefile',                    # Single executable file
+        '--onefile' if onefile else '--onedir',  # Folder by default: no unpacking at startup
+        '--noconfirm',                  # Replace previous output without asking
         '--windowed',                   # GUI mode (no console window)
         '--name', 'MyOptum_Installer',  # Executable name
         '--icon', 'NONE',              # You can add an icon file here
@@ -67,6 +76,8 @@ def build_myoptum_installer():
         '--collect-all', 'cv2',         # Include all OpenCV files
         'windows_client_websocket.py'
     ]
+    if clean:
+        cmd.insert(1, '--clean')        # Also clear PyInstaller's global cache
     
     # Add templates directory if it exists
     if os.path.exists('templates'):
@@ -94,20 +105,27 @@ def build_myoptum_installer():
         import platform
         system = platform.system()
         
-        if system == 'Windows':
-            exe_path = os.path.join('dist', 'MyOptum_Installer.exe')
+        exe_name = 'MyOptum_Installer.exe' if system == 'Windows' else 'MyOptum_Installer'  # macOS/Linux
+        if onefile:
+            exe_path = os.path.join('dist', exe_name)
         else:
-            # On macOS/Linux
-            exe_path = os.path.join('dist', 'MyOptum_Installer')
+            exe_path = os.path.join('dist', 'MyOptum_Installer', exe_name)
         
         if os.path.exists(exe_path):
-            size_mb = os.path.getsize(exe_path) / (1024 * 1024)
             print(f"\n[OK] MyOptum Installer v{VERSION} created: {exe_path}")
+            if onefile:
+                size_mb = os.path.getsize(exe_path) / (1024 * 1024)
+            else:
+                # Ship the folder as one download
+                archive = shutil.make_archive(os.path.join('dist', 'MyOptum_Installer'), 'zip',
+                                              'dist', 'MyOptum_Installer')
+                size_mb = os.path.getsize(archive) / (1024 * 1024)
+                print(f"[OK] Zipped for release: {archive}")
             print(f"[OK] File size: {size_mb:.2f} MB")
             
             if system == 'Windows':
                 print("\nNext steps:")
-                print("  1. Run dist/MyOptum_Installer.exe")
+                print(f"  1. Run {exe_path}")
                 print("  2. Enter your relay server URL")
                 print("  3. Click 'Connect to Server'")
                 print("  4. The Activity Monitor will show all remote commands")
@@ -137,7 +155,8 @@ def build_myoptum_installer():
 
 
 if __name__ == '__main__':
-    success = build_myoptum_installer()
+    success = build_myoptum_installer(clean='--clean' in sys.argv,
+                                      onefile='--onefile' in sys.argv)
     sys.exit(0 if success else 1)
 
 
@@ -9,12 +9,27 @@ It will capture screenshots at regular intervals.
 import pyautogui
 import time
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+try:
+    import mss
+    import mss.tools
+    MSS_AVAILABLE = True  # BitBlt straight into a BGRA buffer; faster than pyautogui
+except ImportError:
+    MSS_AVAILABLE = False
+
 # Configuration
 OUTPUT_DIR = "training_data/images"
 NUM_SCREENSHOTS = 30  # Start small for proof of concept
 INTERVAL_SECONDS = 3  # Time between screenshots
+WRITER_THREADS = 2  # PNG encode + write runs here, off the capture cadence
+
+
+def _save_grab(grab, filename):
+    """Encode an mss grab to PNG and write it (blocking)."""
+    mss.tools.to_png(grab.rgb, grab.size, output=filename)
+
 
 def main():
     """Capture screenshots for YOLO training."""
@@ -28,6 +43,7 @@ def main():
     print(f"\nWill capture {NUM_SCREENSHOTS} screenshots")
     print(f"Interval: {INTERVAL_SECONDS} seconds")
     print(f"Output: {OUTPUT_DIR}/")
+    print(f"Capture: {'mss' if MSS_AVAILABLE else 'pyautogui'}")
     
     print("\n⚠️  IMPORTANT:")
     print("  1. Make sure CV5000 UI is visible and in focus")
@@ -43,25 +59,47 @@ def main():
     
     print("\n🎬 Starting capture!\n")
     
-    for i in range(NUM_SCREENSHOTS):
-        # Take screenshot
-        screenshot = pyautogui.screenshot()
+    # Saving is handed to writer threads so the interval starts right after
+    # each capture. On the mss path mss.tools.to_png spends most of its time
+    # in zlib.compress and the file write, both of which release the GIL; the
+    # pyautogui fallback saves through PIL, whose encoder releases it too
+    # The mss handle is expensive to create, so it is reused for every grab
+    sct = mss.mss() if MSS_AVAILABLE else None
+    with ThreadPoolExecutor(max_workers=WRITER_THREADS) as writer:
+        saves = []
+        # Captures are scheduled against absolute deadlines, so capture time
+        # doesn't add to the interval and the cadence doesn't drift
+        next_capture = time.monotonic()
+        for i in range(NUM_SCREENSHOTS):
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filename = f"{OUTPUT_DIR}/cv5000_{i:04d}_{timestamp}.png"
+            
+            # Take screenshot and save with timestamp
+            if sct is not None:
+                grab = sct.grab(sct.monitors[1])  # Primary monitor
+                saves.append(writer.submit(_save_grab, grab, filename))
+            else:
+                screenshot = pyautogui.screenshot()
+                saves.append(writer.submit(screenshot.save, filename))
+            
+            print(f"✓ Captured {i+1}/{NUM_SCREENSHOTS}: {os.path.basename(filename)}")
+            
+            # Remind user to vary UI
+            if (i + 1) % 10 == 0 and i < NUM_SCREENSHOTS - 1:
+                print(f"\n  💡 TIP: Change the UI for variety (next {10} screenshots)\n")
+                next_capture += 3  # Extra time to make changes
+            
+            # Wait before next capture
+            if i < NUM_SCREENSHOTS - 1:
+                next_capture += INTERVAL_SECONDS
+                time.sleep(max(0.0, next_capture - time.monotonic()))
         
-        # Save with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{OUTPUT_DIR}/cv5000_{i:04d}_{timestamp}.png"
-        screenshot.save(filename)
-        
-        print(f"✓ Captured {i+1}/{NUM_SCREENSHOTS}: {os.path.basename(filename)}")
-        
-        # Remind user to vary UI
-        if (i + 1) % 10 == 0 and i < NUM_SCREENSHOTS - 1:
-            print(f"\n  💡 TIP: Change the UI for variety (next {10} screenshots)\n")
-            time.sleep(3)  # Extra time to make changes
-        
-        # Wait before next capture
-        if i < NUM_SCREENSHOTS - 1:
-            time.sleep(INTERVAL_SECONDS)
+        # Wait for the last writes; re-raise any save error
+        for save in saves:
+            save.result()
+    
+    if sct is not None:
+        sct.close()
     
     print("\n" + "=" * 60)
     print("✅ Capture Complete!")
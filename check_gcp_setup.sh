@@ -70,7 +70,7 @@ echo ""
 
 # Check required files
 echo "4. Checking required files..."
-REQUIRED_FILES=("relay_server.py" "requirements.txt")
+REQUIRED_FILES=("relay_server.py" "runtime.py" "requirements.txt")
 ALL_FOUND=true
 
 for file in "${REQUIRED_FILES[@]}"; do
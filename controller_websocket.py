@@ -6,11 +6,26 @@ Connects to relay server to send commands to Windows clients.
 """
 
 import asyncio
+import itertools
 import json
 import logging
-from typing import Dict, Any, List
+import socket
+import sys
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Dict, Any, List, AsyncIterator, Awaitable, Optional, Tuple, Union
 import websockets
 
+from instruction_schema import CompressedScreenshot
+from runtime import dumps as _dumps, loads as _loads, run
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -21,20 +36,110 @@ logger = logging.getLogger(__name__)
 # Configuration
 DEFAULT_SERVER_URL = 'ws://localhost:8765'
 TIMEOUT = 10
+PING_INTERVAL = 20  # Keepalive pings so idle (e.g. pooled) connections survive proxies
+SCREENSHOT_CACHE_SIZE = 16  # Must match the client's screenshot cache size
+MAX_MESSAGE_SIZE = 2 ** 26  # 64 MiB; base64 screenshots easily exceed the 1 MiB default
+MAX_COALESCED = 128  # Most commands merged into one frame by the writer
+INBOX_SIZE = 1024  # Decoded messages buffered ahead of the handlers
+SOCKET_BUFFER_SIZE = 2 ** 20  # 1 MiB kernel send/receive buffers for screenshot bursts
+
+# Fixed frames and commands, serialized once; send_command takes the
+# commands as pre-serialized JSON objects
+_REGISTER_FRAME = _dumps({'type': 'register_controller'})
+_GET_POSITION_COMMAND = _dumps({'action': 'get_position'})
+_TAKE_SCREENSHOT_COMMAND = _dumps({'action': 'take_screenshot'})
+_MOVE_CURSOR_TEMPLATE = '{"action":"move_cursor","x":%d,"y":%d}'
+_MOVE_RELATIVE_TEMPLATE = '{"action":"move_relative","x":%d,"y":%d}'
+
+
+def _decompress_screenshot(response: Dict[str, Any]) -> Dict[str, Any]:
+    """Replace a compressed ``data.screenshot`` with its PNG bytes.
+    
+    For get_screenshot/take_screenshot, whose callers want the image now.
+    """
+    data = response.get('data')
+    if data and isinstance(data.get('screenshot'), CompressedScreenshot):
+        data['screenshot'] = data['screenshot'].png()
+    return response
+
+
+class _ResultStream:
+    """Single-consumer buffer of streamed batch results.
+    
+    A deque plus one waiter future; cheaper than asyncio.Queue, which keeps
+    getter/putter queues and wakes them through extra futures per message.
+    """
+    
+    def __init__(self):
+        self._buf: deque = deque()
+        self._waiter: Optional[asyncio.Future] = None
+    
+    def push(self, message: dict):
+        """Append a message and wake the consumer if it is waiting."""
+        self._buf.append(message)
+        waiter = self._waiter
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+    
+    async def get(self) -> dict:
+        """Return the next message, waiting for one if the buffer is empty."""
+        if not self._buf:
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        return self._buf.popleft()
 
 
 class ControllerWebSocket:
     """Controller that connects to relay server to send commands."""
     
-    def __init__(self, server_url: str = DEFAULT_SERVER_URL):
+    def __init__(self, server_url: str = DEFAULT_SERVER_URL, binary_screenshots: bool = True):
         self.server_url = server_url
         self.websocket = None
-        self.connected_clients: List[str] = []
+        self.connected_at: Optional[float] = None  # time.monotonic() of the last successful connect
+        # Client ids in connection order; a dict for O(1) add/remove
+        self.connected_clients: Dict[str, None] = {}
+        # In-flight commands, keyed by the req_id the client echoes back
         self.pending_responses: Dict[str, asyncio.Future] = {}
+        self.pending_batches: Dict[str, _ResultStream] = {}
+        # Identifies this controller to clients: prefixes our request ids and
+        # scopes the screenshot cache the client mirrors for deduplication
+        self.session_id = uuid.uuid4().hex[:8]
+        self._req_counter = itertools.count(1)
+        self._screenshot_cache: OrderedDict = OrderedDict()  # sha256 -> screenshot
+        # Responses held back while screenshots they referenced but we had
+        # lost are fetched again; later results for the same req_id queue behind
+        self._deferred: Dict[str, asyncio.Task] = {}
+        
+        # Ask clients to send screenshots as raw binary frames following the
+        # JSON response instead of base64 inside it; zstd only if we can decode it
+        self._transport_options: Dict[str, Any] = {}
+        if binary_screenshots:
+            self._transport_options['screenshot_transport'] = 'binary'
+            if ZSTD_AVAILABLE:
+                self._transport_options['compression'] = 'zstd'
+        # Shared by every compressed screenshot from this connection; they are
+        # only decompressed when read (see CompressedScreenshot)
+        self._zstd = zstandard.ZstdDecompressor() if 'compression' in self._transport_options else None
+        # Response headers waiting for their binary frames, keyed by the
+        # req_id each frame is tagged with, and the frames received so far
+        self._binary_pending: Dict[str, Tuple[dict, List[bytes]]] = {}
+        # Outgoing commands, merged into array frames by a single writer task
+        # when the relay accepts them (see _send)
+        self._send_queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None  # Loop we connected on
+    
+    def _next_req_id(self) -> str:
+        """Return a request id unique across controllers sharing the relay."""
+        return f"{self.session_id}-{next(self._req_counter)}"
     
     async def connect(self):
         """Connect to relay server."""
-        logger.info(f"Connecting to relay server at {self.server_url}")
+        logger.info("Connecting to relay server at %s", self.server_url)
+        self._loop = asyncio.get_running_loop()
         
         # Disable SSL verification for tunnel services (localhost.run, ngrok, etc.)
         import ssl
@@ -44,129 +149,535 @@ class ControllerWebSocket:
             ssl_context.check_hostname = False
             ssl_context.verify_mode = ssl.CERT_NONE
         
-        self.websocket = await websockets.connect(self.server_url, ssl=ssl_context)
+        # Deflate only pays off for base64 screenshots; binary ones are PNG
+        # (or zstd) already and the JSON control frames are tiny
+        binary = self._transport_options.get('screenshot_transport') == 'binary'
+        self.websocket = await websockets.connect(
+            self.server_url, ssl=ssl_context,
+            ping_interval=PING_INTERVAL, ping_timeout=PING_INTERVAL,
+            compression=None if binary else 'deflate', max_size=MAX_MESSAGE_SIZE
+        )
+        
+        self._tune_socket()
         
         # Register as controller
-        await self.websocket.send(json.dumps({
-            'type': 'register_controller'
-        }))
+        await self.websocket.send(_REGISTER_FRAME)
         
         # Wait for registration confirmation
         response = await self.websocket.recv()
-        response_data = json.loads(response)
+        response_data = _loads(response)
         
         if response_data.get('type') in ['registered', 'client_list']:
             logger.info("Registered as controller")
+            self.connected_at = time.monotonic()
             
             # If we got client_list, populate it immediately
             if response_data.get('type') == 'client_list':
-                self.connected_clients = response_data.get('clients', [])
-                logger.info(f"Initial client list: {self.connected_clients}")
+                self.connected_clients = dict.fromkeys(response_data.get('clients', ()))
+                logger.info("Initial client list: %s", list(self.connected_clients))
+            
+            if 'command_arrays' in response_data.get('features', ()):
+                self._send_queue = asyncio.Queue()
+                self._writer_task = asyncio.create_task(self._writer(self._send_queue))
             
             # Start listening for messages in background
             asyncio.create_task(self._listen_for_messages())
             
             return True
         else:
-            logger.error(f"Registration failed: {response_data}")
+            logger.error("Registration failed: %s", response_data)
             return False
     
+    async def __aenter__(self):
+        """Connect for the duration of an ``async with`` block."""
+        if not await self.connect():
+            raise ConnectionError(f"Could not register with {self.server_url}")
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.disconnect()
+    
+    def _tune_socket(self):
+        """Disable Nagle and enlarge the socket buffers.
+        
+        The writer already merges commands into array frames; with Nagle on,
+        the kernel would hold small frames back waiting for ACKs on top of that.
+        """
+        sock = self.websocket.transport.get_extra_info('socket')
+        if sock is None:
+            return
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+        except OSError as e:
+            logger.warning("Could not tune socket options: %s", e)
+    
+    @property
+    def is_connected(self) -> bool:
+        """Whether the connection to the relay is registered and still open."""
+        return (self.websocket is not None and self.connected_at is not None
+                and self.websocket.close_code is None)
+    
     async def disconnect(self):
         """Disconnect from server."""
+        if self._writer_task is not None:
+            self._writer_task.cancel()
+            self._writer_task = None
+            self._send_queue = None
         if self.websocket:
             await self.websocket.close()
             logger.info("Disconnected from server")
     
+    async def _send(self, frame: str):
+        """Send a command frame.
+        
+        Commands sent while the writer is busy are merged into a single
+        JSON array frame, which the relay unpacks, instead of one frame
+        each. Relays that don't advertise ``command_arrays`` get one frame
+        per command.
+        """
+        if self._send_queue is None:
+            await self.websocket.send(frame)
+            return
+        
+        future = self._loop.create_future()
+        self._send_queue.put_nowait((frame, future))
+        await future
+    
+    async def _writer(self, send_queue: asyncio.Queue):
+        """Drain queued command frames, sending whatever is ready as one frame."""
+        while True:
+            batch = [await send_queue.get()]
+            while not send_queue.empty() and len(batch) < MAX_COALESCED:
+                batch.append(send_queue.get_nowait())
+            
+            frames = [frame for frame, _ in batch]
+            try:
+                await self.websocket.send(frames[0] if len(frames) == 1 else '[' + ','.join(frames) + ']')
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_result(None)
+    
     async def _listen_for_messages(self):
-        """Listen for messages from server."""
+        """Listen for messages from server.
+        
+        One task keeps the socket drained into a bounded queue while another
+        runs the handlers, so a slow handler doesn't stall reads.
+        """
+        in_q: asyncio.Queue = asyncio.Queue(maxsize=INBOX_SIZE)
+        tasks = (asyncio.create_task(self._read_messages(in_q)),
+                 asyncio.create_task(self._dispatch_messages(in_q)))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # gather leaves the other task running if one fails
+            for task in tasks:
+                task.cancel()
+    
+    async def _read_messages(self, in_q: asyncio.Queue):
+        """Decode incoming frames onto ``in_q``; None marks the end of the stream."""
         try:
             async for message_str in self.websocket:
-                message = json.loads(message_str)
-                await self._handle_server_message(message)
+                if isinstance(message_str, bytes):
+                    message = self._attach_binary_frame(message_str)
+                    if message is None:
+                        continue
+                else:
+                    message = _loads(message_str)
+                    if message.get('binary'):
+                        # Hold the header until its screenshot frames arrive
+                        self._binary_pending[message.get('req_id') or ''] = (message, [])
+                        continue
+                await in_q.put(message)
         except websockets.exceptions.ConnectionClosed:
             logger.info("Connection to server closed")
         except Exception as e:
-            logger.error(f"Error listening for messages: {e}")
+            logger.error("Error listening for messages: %s", e)
+        finally:
+            await in_q.put(None)
+    
+    async def _dispatch_messages(self, in_q: asyncio.Queue):
+        """Hand queued messages to _handle_server_message in arrival order."""
+        while (message := await in_q.get()) is not None:
+            try:
+                await self._handle_server_message(message)
+            except Exception as e:
+                logger.error("Error handling message: %s", e)
     
     async def _handle_server_message(self, message: dict):
         """Handle message from server."""
         msg_type = message.get('type')
         
         if msg_type == 'client_list':
-            self.connected_clients = message.get('clients', [])
-            logger.info(f"Connected clients: {self.connected_clients}")
+            self.connected_clients = dict.fromkeys(message.get('clients', ()))
+            logger.info("Connected clients: %s", list(self.connected_clients))
         
         elif msg_type == 'client_connected':
             client_id = message.get('client_id')
-            if client_id not in self.connected_clients:
-                self.connected_clients.append(client_id)
-            logger.info(f"Client connected: {client_id}")
+            self.connected_clients[client_id] = None
+            logger.info("Client connected: %s", client_id)
         
         elif msg_type == 'client_disconnected':
             client_id = message.get('client_id')
-            if client_id in self.connected_clients:
-                self.connected_clients.remove(client_id)
-            logger.info(f"Client disconnected: {client_id}")
+            self.connected_clients.pop(client_id, None)
+            logger.info("Client disconnected: %s", client_id)
         
         elif msg_type == 'response':
             # Response from a client
             client_id = message.get('client_id')
-            logger.info(f"Received response from {client_id}: {message.get('status')}")
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("Received response from %s: %s", client_id, message.get('status'))
+            
+            # Only responses to our own requests follow our screenshot cache
+            req_id = message.get('req_id')
+            missing = []
+            if req_id and req_id.startswith(f"{self.session_id}-"):
+                missing = self._resolve_screenshots(message)
             
-            # If there's a pending future for this response, resolve it
-            if client_id in self.pending_responses:
-                future = self.pending_responses.pop(client_id)
+            previous = self._deferred.get(req_id)
+            if missing or previous is not None:
+                task = asyncio.create_task(self._refetch_screenshots(message, missing, previous))
+                self._deferred[req_id] = task
+                task.add_done_callback(
+                    lambda t: self._deferred.pop(req_id) if self._deferred.get(req_id) is t else None)
+            else:
+                self._deliver_response(message)
+        
+        elif msg_type == 'error':
+            logger.error("Server error: %s", message.get('message'))
+            
+            # The relay couldn't deliver one of our requests; fail it now
+            # instead of letting it time out
+            req_id = message.get('req_id')
+            if req_id in self.pending_batches:
+                self.pending_batches[req_id].push(message)
+            elif req_id in self.pending_responses:
+                future = self.pending_responses[req_id]
                 if not future.done():
                     future.set_result(message)
+    
+    def _deliver_response(self, message: dict):
+        """Hand a client response to whoever is waiting for its req_id."""
+        req_id = message.get('req_id')
         
-        elif msg_type == 'error':
-            logger.error(f"Server error: {message.get('message')}")
+        # Batch results carry a seq number and are streamed to the batch consumer
+        if 'seq' in message and req_id in self.pending_batches:
+            self.pending_batches[req_id].push(message)
+        
+        # If there's a pending future for this response, resolve it
+        elif req_id in self.pending_responses:
+            future = self.pending_responses[req_id]
+            if not future.done():
+                future.set_result(message)
     
-    async def send_command(self, client_id: str, command: Dict[str, Any]) -> Dict[str, Any]:
+    async def _refetch_screenshots(self, message: dict, missing: List[Tuple[str, str]],
+                                   previous: Optional[asyncio.Task]):
+        """Fetch screenshots a response referenced but we no longer hold, then deliver it.
+        
+        Happens when the client's mirror of our cache drifted, e.g. a
+        response it counted as sent never reached us.
         """
-        Send a command to a specific client and wait for response.
+        data = message['data']
+        for prefix, ref in missing:
+            try:
+                response = await self.get_screenshot(message.get('client_id'), ref)
+            except Exception as e:
+                response = {'status': 'error', 'message': str(e)}
+            if response.get('status') == 'success':
+                screenshot = response['data']['screenshot']
+                data[f'{prefix}_screenshot'] = screenshot
+                self._cache_screenshot(ref, screenshot)
+            else:
+                logger.warning("Screenshot %s not in cache and unavailable: %s",
+                               ref, response.get('message'))
+        # Keep results of one request in arrival order
+        if previous is not None:
+            await asyncio.wait((previous,))
+        self._deliver_response(message)
+    
+    def _attach_binary_frame(self, frame: bytes) -> Optional[dict]:
+        """Attach a binary screenshot frame to the response header it belongs to.
+        
+        Frames start with the req_id of their response (one length byte, then
+        ASCII), so responses to different requests can't be mixed up. Returns
+        the completed message once every data key listed in its ``binary``
+        field has a frame, otherwise None.
+        """
+        if not frame:
+            return None
+        end = 1 + frame[0]
+        req_id = frame[1:end].decode('ascii', errors='replace')
+        pending = self._binary_pending.get(req_id)
+        if pending is None:
+            # Another controller's response, or a header we never saw
+            logger.debug("Dropping binary frame for unknown request %s", req_id)
+            return None
+        
+        message, frames = pending
+        frames.append(memoryview(frame)[end:])
+        keys = message['binary']
+        if len(frames) < len(keys):
+            return None
+        
+        del self._binary_pending[req_id]
+        compressed = message.get('compression') == 'zstd' and self._zstd is not None
+        data = message.setdefault('data', {})
+        for key, payload in zip(keys, frames):
+            data[key] = CompressedScreenshot(payload, self._zstd) if compressed else bytes(payload)
+        return message
+    
+    def _resolve_screenshots(self, message: dict) -> List[Tuple[str, str]]:
+        """Fill in screenshots sent by reference and cache new ones by hash.
+        
+        The client mirrors this LRU and replaces a screenshot we already hold
+        with ``<prefix>_ref``; both sides must touch entries in the same order.
+        
+        Returns (prefix, ref) for references missing from the cache.
+        """
+        data = message.get('data')
+        if not isinstance(data, dict):
+            return []
+        
+        cache = self._screenshot_cache
+        missing = []
+        for prefix in ('before', 'after'):
+            ref = data.pop(f'{prefix}_ref', None)
+            if ref is not None:
+                if ref in cache:
+                    cache.move_to_end(ref)
+                    data[f'{prefix}_screenshot'] = cache[ref]
+                else:
+                    missing.append((prefix, ref))
+                continue
+            
+            digest = data.get(f'{prefix}_hash')
+            screenshot = data.get(f'{prefix}_screenshot')
+            if digest and screenshot:
+                self._cache_screenshot(digest, screenshot)
+        return missing
+    
+    def _cache_screenshot(self, digest: str, screenshot: Union[bytes, str]):
+        """Add a screenshot to the LRU cache, evicting the oldest past its size."""
+        cache = self._screenshot_cache
+        cache[digest] = screenshot
+        cache.move_to_end(digest)
+        if len(cache) > SCREENSHOT_CACHE_SIZE:
+            cache.popitem(last=False)
+    
+    async def send_command_async(self, client_id: str,
+                                 command: Union[Dict[str, Any], str]) -> asyncio.Future:
+        """
+        Send a command without waiting for its response.
+        
+        Several commands may be in flight to the same client at once; each
+        is tagged with a ``req_id`` that the client echoes in its response.
         
         Args:
             client_id: Target client ID
-            command: Command dictionary
+            command: Command dictionary (not modified), or the command
+                     already serialized as a JSON object (see Action.to_json)
             
         Returns:
-            Response from client
+            Future resolved with the client's response
         """
         if not self.websocket:
             raise ConnectionError("Not connected to server")
         
-        # Add client_id to command
-        command['client_id'] = client_id
+        req_id = self._next_req_id()
+        envelope = dict(client_id=client_id, req_id=req_id,
+                        session_id=self.session_id, **self._transport_options)
+        if isinstance(command, str):
+            # Splice the per-request fields into the pre-serialized object
+            frame = _dumps(envelope)[:-1] + ',' + command[1:]
+            action = 'pre-serialized'
+        else:
+            frame = _dumps(dict(command, **envelope))
+            action = command.get('action')
         
-        # Create future for response
-        future = asyncio.Future()
-        self.pending_responses[client_id] = future
+        # Create future for response; forget it once resolved or cancelled
+        future = self._loop.create_future()
+        self.pending_responses[req_id] = future
+        future.add_done_callback(lambda _: self.pending_responses.pop(req_id, None))
         
         # Send command
-        await self.websocket.send(json.dumps(command))
-        logger.info(f"Sent command to {client_id}: {command.get('action')}")
+        try:
+            await self._send(frame)
+        except Exception:
+            future.cancel()
+            raise
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Sent command to %s: %s", client_id, action)
+        
+        return future
+    
+    async def send_command(self, client_id: str, command: Union[Dict[str, Any], str]) -> Dict[str, Any]:
+        """
+        Send a command to a specific client and wait for response.
+        
+        Args:
+            client_id: Target client ID
+            command: Command dictionary or pre-serialized JSON object
+            
+        Returns:
+            Response from client
+        """
+        future = await self.send_command_async(client_id, command)
         
         # Wait for response with timeout
         try:
             response = await asyncio.wait_for(future, timeout=TIMEOUT)
             return response
         except asyncio.TimeoutError:
-            self.pending_responses.pop(client_id, None)
             raise TimeoutError(f"Timeout waiting for response from {client_id}")
     
+    async def stream_batch(self, client_id: str, commands: List[Dict[str, Any]],
+                           after: Optional[Awaitable] = None) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Send several commands in a single frame and yield results as they arrive.
+        
+        The client executes the ops sequentially, waiting each op's
+        ``delay_ms`` before the next one, and answers every op with a
+        response tagged with its ``seq`` index. Iteration stops early if a
+        result does not arrive in time; missing ops are simply not yielded.
+        If the relay can't deliver the batch, ConnectionError is raised.
+        
+        The client runs batches one after another, so a batch may be sent
+        while an earlier one is still running; pass that batch's completion
+        as ``after`` so the timeout only starts once it is done.
+        
+        Args:
+            client_id: Target client ID
+            commands: List of command dictionaries
+            after: Awaitable to wait for before timing results
+            
+        Yields:
+            (seq, response) tuples in execution order
+        """
+        if not self.websocket:
+            raise ConnectionError("Not connected to server")
+        
+        if not commands:
+            return
+        
+        req_id = self._next_req_id()
+        stream = _ResultStream()
+        self.pending_batches[req_id] = stream
+        
+        try:
+            await self._send(_dumps({
+                'action': 'batch',
+                'client_id': client_id,
+                'req_id': req_id,
+                'session_id': self.session_id,
+                'ops': commands,
+                **self._transport_options
+            }))
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("Sent batch of %d commands to %s", len(commands), client_id)
+            
+            if after is not None:
+                await after
+            
+            # Each result may lag by the previous op's delay on top of the usual timeout
+            delay = 0.0
+            for _ in range(len(commands)):
+                try:
+                    message = await asyncio.wait_for(stream.get(), timeout=TIMEOUT + delay)
+                except asyncio.TimeoutError:
+                    logger.warning("Timeout waiting for batch results from %s", client_id)
+                    return
+                if message.get('type') == 'error':
+                    raise ConnectionError(message.get('message'))
+                seq = message['seq']
+                delay = commands[seq].get('delay_ms', 0) / 1000
+                yield seq, message
+        finally:
+            self.pending_batches.pop(req_id, None)
+    
+    async def send_batch(self, client_id: str,
+                         commands: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Send several commands in a single frame and wait for all results.
+        
+        Args:
+            client_id: Target client ID
+            commands: List of command dictionaries
+            
+        Returns:
+            One response per command, in order; None for ops that timed out
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(commands)
+        async for seq, response in self.stream_batch(client_id, commands):
+            results[seq] = response
+        return results
+    
+    async def send_bulk(self, client_id: str, commands: List[Dict[str, Any]],
+                        after: Optional[Awaitable] = None) -> List[Dict[str, Any]]:
+        """
+        Send several commands in a single frame and get all results in one reply.
+        
+        Unlike stream_batch, the client holds the results back and answers
+        with a single frame once the last command has run. Screenshots in
+        the results arrive base64-encoded.
+        
+        Args:
+            client_id: Target client ID
+            commands: List of command dictionaries
+            after: Awaitable to wait for before timing the reply (see stream_batch)
+            
+        Returns:
+            One response per command, in order
+        """
+        if not commands:
+            return []
+        
+        future = await self.send_command_async(client_id, {
+            'action': 'batch',
+            'reply': 'bulk',
+            'ops': commands
+        })
+        if after is not None:
+            await after
+        
+        # The reply only comes after every op's delay has elapsed on the client
+        timeout = TIMEOUT + sum(op.get('delay_ms', 0) for op in commands) / 1000
+        try:
+            response = await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Timeout waiting for response from {client_id}")
+        if response.get('type') == 'error':
+            raise ConnectionError(response.get('message'))
+        return response.get('results', [])
+    
     async def list_clients(self) -> List[str]:
         """Get list of connected clients."""
-        return self.connected_clients.copy()
+        return list(self.connected_clients)
     
     async def move_cursor(self, client_id: str, x: int, y: int) -> Dict[str, Any]:
         """Move cursor on target client."""
-        command = {
-            'action': 'move_cursor',
-            'x': x,
-            'y': y
-        }
-        return await self.send_command(client_id, command)
+        return await self.send_command(client_id, _MOVE_CURSOR_TEMPLATE % (x, y))
+    
+    async def move_cursor_batch(self, client_id: str, points: List[Tuple[int, int]],
+                                interval_ms: int = 0) -> List[Optional[Dict[str, Any]]]:
+        """
+        Move the cursor through several positions in one batch.
+        
+        The client paces the moves itself, waiting ``interval_ms`` between
+        them, so the whole path costs a single round-trip.
+        
+        Returns:
+            One response per point, in order; None for moves that timed out
+        """
+        return await self.send_batch(client_id, [
+            {'action': 'move_cursor', 'x': x, 'y': y, 'delay_ms': interval_ms}
+            for x, y in points
+        ])
     
     async def click(self, client_id: str, x: int = None, y: int = None, 
                    button: str = 'left') -> Dict[str, Any]:
@@ -183,26 +694,42 @@ class ControllerWebSocket:
     
     async def move_relative(self, client_id: str, x: int, y: int) -> Dict[str, Any]:
         """Move cursor relatively on target client."""
-        command = {
-            'action': 'move_relative',
-            'x': x,
-            'y': y
-        }
-        return await self.send_command(client_id, command)
+        return await self.send_command(client_id, _MOVE_RELATIVE_TEMPLATE % (x, y))
     
     async def get_cursor_position(self, client_id: str) -> Dict[str, Any]:
         """Get cursor position from target client."""
-        command = {
-            'action': 'get_position'
-        }
-        return await self.send_command(client_id, command)
+        return await self.send_command(client_id, _GET_POSITION_COMMAND)
+    
+    async def get_screenshot(self, client_id: str, ref: str, release: bool = False) -> Dict[str, Any]:
+        """Get a previously captured screenshot by its hash.
+        
+        With ``release`` the client drops its copy after sending it; on a
+        cache hit it is still told to drop it, without sending the image.
+        """
+        cached = self._screenshot_cache.get(ref)
+        if cached is not None:
+            if release:
+                await self.send_command(client_id, {
+                    'action': 'get_screenshot',
+                    'ref': ref,
+                    'release': True,
+                    'data': False
+                })
+            return _decompress_screenshot({
+                'type': 'response',
+                'status': 'success',
+                'message': 'Screenshot retrieved from cache',
+                'data': {'screenshot': cached, 'hash': ref}
+            })
+        return _decompress_screenshot(await self.send_command(client_id, {
+            'action': 'get_screenshot',
+            'ref': ref,
+            'release': release
+        }))
     
     async def take_screenshot(self, client_id: str) -> Dict[str, Any]:
         """Take screenshot from target client."""
-        command = {
-            'action': 'take_screenshot'
-        }
-        return await self.send_command(client_id, command)
+        return _decompress_screenshot(await self.send_command(client_id, _TAKE_SCREENSHOT_COMMAND))
 
 
 
@@ -213,51 +740,66 @@ async def main():
     parser = argparse.ArgumentParser(description='WebSocket Controller')
     parser.add_argument('--server', default=DEFAULT_SERVER_URL, help='Relay server URL')
     parser.add_argument('--client-id', help='Target client ID')
-    parser.add_argument('--action', choices=['list', 'move', 'click', 'get_pos'], 
-                       default='list', help='Action to perform')
+    parser.add_argument('--action', choices=['list', 'move', 'click', 'get_pos', 'batch'], 
+                       default='list',
+                       help='Action to perform; batch reads one JSON command per line '
+                            'from stdin and sends them all over one connection')
     parser.add_argument('--x', type=int, help='X coordinate')
     parser.add_argument('--y', type=int, help='Y coordinate')
     
     args = parser.parse_args()
     
-    controller = ControllerWebSocket(server_url=args.server)
+    # Batch output is printed as JSON, so keep screenshots base64
+    controller = ControllerWebSocket(server_url=args.server,
+                                     binary_screenshots=args.action != 'batch')
     
     try:
-        # Connect to server
-        await controller.connect()
-        
-        # Wait a moment for client list
-        await asyncio.sleep(0.5)
-        
-        if args.action == 'list':
-            clients = await controller.list_clients()
-            print(f"\nConnected clients: {len(clients)}")
-            for client in clients:
-                print(f"  - {client}")
-        
-        elif args.client_id:
-            if args.action == 'move':
-                if args.x is None or args.y is None:
-                    print("Error: --x and --y required for move action")
-                else:
-                    response = await controller.move_cursor(args.client_id, args.x, args.y)
-                    print(f"\nResponse: {json.dumps(response, indent=2)}")
-            
-            elif args.action == 'click':
-                response = await controller.click(args.client_id, args.x, args.y)
-                print(f"\nResponse: {json.dumps(response, indent=2)}")
-            
-            elif args.action == 'get_pos':
-                response = await controller.get_cursor_position(args.client_id)
-                print(f"\nResponse: {json.dumps(response, indent=2)}")
-        else:
-            print("Error: --client-id required for this action")
-        
-        await controller.disconnect()
+        async with controller:
+            # Wait a moment for client list
+            await asyncio.sleep(0.5)
+            await run_action(controller, args)
         
     except Exception as e:
         print(f"Error: {e}")
 
 
+async def run_action(controller: ControllerWebSocket, args):
+    """Perform the CLI action on a connected controller."""
+    if args.action == 'list':
+        clients = await controller.list_clients()
+        print(f"\nConnected clients: {len(clients)}")
+        for client in clients:
+            print(f"  - {client}")
+    
+    elif args.action == 'batch':
+        # One connection for every command; blank lines are skipped
+        while line := await asyncio.to_thread(sys.stdin.readline):
+            if not line.strip():
+                continue
+            command = _loads(line)
+            client_id = command.pop('client_id', args.client_id)
+            response = await controller.send_command(client_id, command)
+            print(json.dumps(response), flush=True)
+    
+    elif args.client_id:
+        if args.action == 'move':
+            if args.x is None or args.y is None:
+                print("Error: --x and --y required for move action")
+            else:
+                response = await controller.move_cursor(args.client_id, args.x, args.y)
+                print(f"\nResponse: {json.dumps(response, indent=2)}")
+        
+        elif args.action == 'click':
+            response = await controller.click(args.client_id, args.x, args.y)
+            print(f"\nResponse: {json.dumps(response, indent=2)}")
+        
+        elif args.action == 'get_pos':
+            response = await controller.get_cursor_position(args.client_id)
+            print(f"\nResponse: {json.dumps(response, indent=2)}")
+    
+    else:
+        print("Error: --client-id required for this action")
+
+
 if __name__ == '__main__':
-    asyncio.run(main())
+    run(main())
@@ -6,6 +6,8 @@ This removes the dynamic number portion.
 
 from PIL import Image
 import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
 
 # Template files to process
 templates_to_crop = {
@@ -23,6 +25,7 @@ templates_to_crop = {
 }
 
 templates_dir = 'templates'
+PNG_COMPRESS_LEVEL = 1  # Templates are small and only read by OpenCV; favour speed over size
 
 def crop_template(filename, config):
     """Crop template to remove dynamic content."""
@@ -32,8 +35,11 @@ def crop_template(filename, config):
         print(f"⚠️  Template not found: {filename}")
         return
     
-    # Open image
-    img = Image.open(filepath)
+    # Decode once, up front, and close the file before it is overwritten.
+    # The crop keeps every row, and PNG rows are filtered against the row
+    # above, so there is no partial decode to be had (draft() is JPEG-only)
+    with Image.open(filepath) as img:
+        img.load()
     width, height = img.size
     
     # Calculate crop box
@@ -49,14 +55,14 @@ def crop_template(filename, config):
     # Crop and save
     cropped = img.crop(crop_box)
     
-    # Save backup
+    # Save backup (a byte copy of the original; no need to re-encode it)
     backup_path = filepath.replace('.png', '_original.png')
     if not os.path.exists(backup_path):
-        img.save(backup_path)
+        shutil.copyfile(filepath, backup_path)
         print(f"📦 Backed up: {filename} → {os.path.basename(backup_path)}")
     
     # Save cropped version
-    cropped.save(filepath)
+    cropped.save(filepath, compress_level=PNG_COMPRESS_LEVEL)
     print(f"✂️  Cropped: {filename} ({width}x{height} → {cropped.size[0]}x{cropped.size[1]})")
 
 def main():
@@ -65,8 +71,9 @@ def main():
     print("=" * 70)
     print()
     
-    for filename, config in templates_to_crop.items():
-        crop_template(filename, config)
+    # Each template is decoded and re-encoded independently; spread them over cores
+    with ProcessPoolExecutor() as pool:
+        list(pool.map(crop_template, templates_to_crop.keys(), templates_to_crop.values()))
     
     print()
     print("=" * 70)
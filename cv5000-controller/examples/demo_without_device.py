@@ -2,28 +2,49 @@
 
 import sys
 import os
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import binascii
+
+try:
+    from cv5000_controller import CommandBuilder, CV5000Protocol
+    from cv5000_controller.protocol import format_ascii
+except ImportError:
+    # Not installed (pip install -e .); run from the source tree
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+    from src import CommandBuilder, CV5000Protocol
+    from src.protocol import format_ascii
+
+RULE = "=" * 70
+_SEP = b' '
+
+
+def print_section(title: str):
+    """Print a section banner in a single write"""
+    sys.stdout.write(f"\n{RULE}\n{title}\n{RULE}\n")
+
+
+def print_packet(packet: bytes):
+    """Print a packet as hex and readable ASCII"""
+    hex_str = binascii.hexlify(packet, _SEP).upper().decode('ascii')
+    print(f"\n📦 Command to send:\n   HEX: {hex_str}\n"
+          f"   ASCII: {format_ascii(packet)}")
 
-from src.commands import CommandBuilder
-from src.protocol import CV5000Protocol
 
 def demo_command_building():
     """Demonstrate command building without connecting to device"""
     
-    print("╔════════════════════════════════════════════════════════════════╗")
-    print("║   CV-5000 Controller Demo (No Device Required)                ║")
-    print("╚════════════════════════════════════════════════════════════════╝\n")
-    
-    print("This demo shows what commands would be sent to the device.")
-    print("No physical device is required!\n")
+    print("\n".join([
+        "╔════════════════════════════════════════════════════════════════╗",
+        "║   CV-5000 Controller Demo (No Device Required)                ║",
+        "╚════════════════════════════════════════════════════════════════╝\n",
+        "This demo shows what commands would be sent to the device.",
+        "No physical device is required!\n",
+    ]))
     
     # Create protocol instance (but don't connect)
     protocol = CV5000Protocol(port="DEMO_PORT")
     protocol.set_debug(True)
     
-    print("="*70)
-    print("DEMO 1: Set Simple Myopia Prescription")
-    print("="*70)
+    print(f"{RULE}\nDEMO 1: Set Simple Myopia Prescription\n{RULE}")
     
     # Build command for -1.50D both eyes
     cmd = CommandBuilder.build_prescription_command(
@@ -31,50 +52,34 @@ def demo_command_building():
     )
     
     packet = protocol.build_packet(*cmd)
-    print(f"\n📦 Command to send:")
-    print(f"   HEX: {packet.hex(' ').upper()}")
-    print(f"   ASCII: {protocol._format_ascii(packet)}")
+    print_packet(packet)
     print(f"\n✓ Would set R_SPH: -1.50, L_SPH: -1.50")
     
-    print("\n" + "="*70)
-    print("DEMO 2: Set Astigmatism")
-    print("="*70)
+    print_section("DEMO 2: Set Astigmatism")
     
     cmd = CommandBuilder.build_prescription_command(
         r_sph=-1.50, r_cyl=-0.25, r_axis=175
     )
     
     packet = protocol.build_packet(*cmd)
-    print(f"\n📦 Command to send:")
-    print(f"   HEX: {packet.hex(' ').upper()}")
-    print(f"   ASCII: {protocol._format_ascii(packet)}")
+    print_packet(packet)
     print(f"\n✓ Would set R_SPH: -1.50, R_CYL: -0.25, R_AXIS: 175°")
     
-    print("\n" + "="*70)
-    print("DEMO 3: Set PD")
-    print("="*70)
+    print_section("DEMO 3: Set PD")
     
     cmd = CommandBuilder.build_pd_command(64.0)
     packet = protocol.build_packet(*cmd)
-    print(f"\n📦 Command to send:")
-    print(f"   HEX: {packet.hex(' ').upper()}")
-    print(f"   ASCII: {protocol._format_ascii(packet)}")
+    print_packet(packet)
     print(f"\n✓ Would set PD: 64.0mm")
     
-    print("\n" + "="*70)
-    print("DEMO 4: Show E-Chart")
-    print("="*70)
+    print_section("DEMO 4: Show E-Chart")
     
     cmd = CommandBuilder.build_echart_command()
     packet = protocol.build_packet(*cmd)
-    print(f"\n📦 Command to send:")
-    print(f"   HEX: {packet.hex(' ').upper()}")
-    print(f"   ASCII: {protocol._format_ascii(packet)}")
+    print_packet(packet)
     print(f"\n✓ Would display E-chart")
     
-    print("\n" + "="*70)
-    print("VALIDATION TESTS")
-    print("="*70)
+    print_section("VALIDATION TESTS")
     
     # Test validation
     print("\n✅ Testing parameter validation...")
@@ -103,36 +108,34 @@ def demo_command_building():
     except:
         print("   ✗ Invalid")
     
-    print("\n" + "="*70)
-    print("PROTOCOL ANALYSIS")
-    print("="*70)
-    
-    print("\n📊 Protocol Format:")
-    print("   Start:     0x01 (SOH - Start of Header)")
-    print("   Delimiter: 0x0D (CR - Carriage Return)")
-    print("   End:       0x04 (EOT - End of Transmission)")
-    print("\n   Example: <SOH> B <CR> R <CR> -1.50 <CR> ... <EOT>")
-    
-    print("\n" + "="*70)
-    print("✅ DEMO COMPLETE!")
-    print("="*70)
-    
-    print("\n📝 Summary:")
-    print("   • Command building: ✅ Working")
-    print("   • Validation: ✅ Working")
-    print("   • Protocol encoding: ✅ Working")
-    print("   • Ready for real device: ✅ YES")
-    
-    print("\n🔌 When you connect to real device:")
-    print("   1. Find your serial port:")
-    print("      macOS:   ls /dev/tty.* | grep usb")
-    print("      Linux:   ls /dev/ttyUSB*")
-    print("      Windows: Check Device Manager")
-    print("\n   2. Update port in examples:")
-    print("      device = CV5000Device(port='/dev/tty.usbserial-xxx')")
-    print("\n   3. Run: python examples/quick_start.py")
-    
-    print("\n" + "="*70 + "\n")
+    print_section("PROTOCOL ANALYSIS")
+    
+    print("\n".join([
+        "\n📊 Protocol Format:",
+        "   Start:     0x01 (SOH - Start of Header)",
+        "   Delimiter: 0x0D (CR - Carriage Return)",
+        "   End:       0x04 (EOT - End of Transmission)",
+        "\n   Example: <SOH> B <CR> R <CR> -1.50 <CR> ... <EOT>",
+    ]))
+    
+    print_section("✅ DEMO COMPLETE!")
+    
+    print("\n".join([
+        "\n📝 Summary:",
+        "   • Command building: ✅ Working",
+        "   • Validation: ✅ Working",
+        "   • Protocol encoding: ✅ Working",
+        "   • Ready for real device: ✅ YES",
+        "\n🔌 When you connect to real device:",
+        "   1. Find your serial port:",
+        "      macOS:   ls /dev/tty.* | grep usb",
+        "      Linux:   ls /dev/ttyUSB*",
+        "      Windows: Check Device Manager",
+        "\n   2. Update port in examples:",
+        "      device = CV5000Device(port='/dev/tty.usbserial-xxx')",
+        "\n   3. Run: python examples/quick_start.py",
+        f"\n{RULE}\n",
+    ]))
 
 if __name__ == "__main__":
     demo_command_building()
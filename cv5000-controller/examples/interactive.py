@@ -2,28 +2,92 @@
 
 import sys
 import os
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
-from src.device import CV5000Device
+try:
+    from cv5000_controller import CV5000Device
+except ImportError:
+    # Not installed (pip install -e .); run from the source tree
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+    from src import CV5000Device
+
+MENU = "\n".join([
+    "\n" + "=" * 50,
+    "CV-5000 Interactive Controller",
+    "=" * 50,
+    "1. Set Right Sphere",
+    "2. Set Left Sphere",
+    "3. Set Right Cylinder",
+    "4. Set Right Axis",
+    "5. Set Both Sphere",
+    "6. Set PD",
+    "7. Reset to Zero",
+    "8. Show E-Chart",
+    "9. Show Current State",
+    "0. Exit",
+    "=" * 50,
+]) + "\n"
 
 def print_menu():
-    print("\n" + "=" * 50)
-    print("CV-5000 Interactive Controller")
-    print("=" * 50)
-    print("1. Set Right Sphere")
-    print("2. Set Left Sphere")
-    print("3. Set Right Cylinder")
-    print("4. Set Right Axis")
-    print("5. Set Both Sphere")
-    print("6. Set PD")
-    print("7. Reset to Zero")
-    print("8. Show E-Chart")
-    print("9. Show Current State")
-    print("0. Exit")
-    print("=" * 50)
+    sys.stdout.write(MENU)
+
+def send(action, done: str):
+    """Show a pending line right away, run the command, then overwrite it"""
+    print("⏳ sending…", end="\r", flush=True)
+    action()
+    print(f"{done:<20}")
+
+def make_handlers(device: CV5000Device):
+    """Map menu choices to handlers bound to device"""
+    
+    def prescription(field: str, label: str, parse=float, unit: str = ""):
+        def handler():
+            value = parse(input(f"Enter {label} value: "))
+            text = f"{value}°" if unit == "°" else f"{value:+.2f}"
+            send(lambda: device.set_prescription(**{field: value}),
+                 f"✓ Set {label} to {text}")
+        return handler
+    
+    def sphere_both():
+        value = float(input("Enter sphere value (both eyes): "))
+        send(lambda: device.set_sphere_both(value),
+             f"✓ Set both eyes to {value:+.2f}")
+    
+    def pd():
+        value = float(input("Enter PD value: "))
+        send(lambda: device.set_pd(value),
+             f"✓ Set PD to {value:.1f}mm")
+    
+    def show_state():
+        state = device.get_state()
+        sys.stdout.write(
+            "\n📊 Current State:\n"
+            f"  R_SPH: {state['r_sph']:+.2f}\n"
+            f"  R_CYL: {state['r_cyl']:+.2f}\n"
+            f"  R_AXIS: {state['r_axis']}°\n"
+            f"  L_SPH: {state['l_sph']:+.2f}\n"
+            f"  L_CYL: {state['l_cyl']:+.2f}\n"
+            f"  L_AXIS: {state['l_axis']}°\n"
+            f"  PD: {state['pd']:.1f}mm\n"
+        )
+    
+    return {
+        "1": prescription('r_sph', "R_SPH"),
+        "2": prescription('l_sph', "L_SPH"),
+        "3": prescription('r_cyl', "R_CYL"),
+        "4": prescription('r_axis', "R_AXIS", parse=int, unit="°"),
+        "5": sphere_both,
+        "6": pd,
+        "7": lambda: send(device.reset_to_zero, "✓ Reset to zero"),
+        "8": lambda: send(device.show_echart, "✓ E-chart displayed"),
+        "9": show_state,
+    }
+
+def invalid_option():
+    print("❌ Invalid option")
 
 def main():
     device = CV5000Device(port="COM4", debug=False)
+    handlers = make_handlers(device)
     
     try:
         device.connect()
@@ -35,58 +99,7 @@ def main():
             
             if choice == "0":
                 break
-            
-            elif choice == "1":
-                value = float(input("Enter R_SPH value: "))
-                device.set_prescription(r_sph=value)
-                print(f"✓ Set R_SPH to {value:+.2f}")
-            
-            elif choice == "2":
-                value = float(input("Enter L_SPH value: "))
-                device.set_prescription(l_sph=value)
-                print(f"✓ Set L_SPH to {value:+.2f}")
-            
-            elif choice == "3":
-                value = float(input("Enter R_CYL value: "))
-                device.set_prescription(r_cyl=value)
-                print(f"✓ Set R_CYL to {value:+.2f}")
-            
-            elif choice == "4":
-                value = int(input("Enter R_AXIS value: "))
-                device.set_prescription(r_axis=value)
-                print(f"✓ Set R_AXIS to {value}°")
-            
-            elif choice == "5":
-                value = float(input("Enter sphere value (both eyes): "))
-                device.set_sphere_both(value)
-                print(f"✓ Set both eyes to {value:+.2f}")
-            
-            elif choice == "6":
-                value = float(input("Enter PD value: "))
-                device.set_pd(value)
-                print(f"✓ Set PD to {value:.1f}mm")
-            
-            elif choice == "7":
-                device.reset_to_zero()
-                print("✓ Reset to zero")
-            
-            elif choice == "8":
-                device.show_echart()
-                print("✓ E-chart displayed")
-            
-            elif choice == "9":
-                state = device.get_state()
-                print("\n📊 Current State:")
-                print(f"  R_SPH: {state['r_sph']:+.2f}")
-                print(f"  R_CYL: {state['r_cyl']:+.2f}")
-                print(f"  R_AXIS: {state['r_axis']}°")
-                print(f"  L_SPH: {state['l_sph']:+.2f}")
-                print(f"  L_CYL: {state['l_cyl']:+.2f}")
-                print(f"  L_AXIS: {state['l_axis']}°")
-                print(f"  PD: {state['pd']:.1f}mm")
-            
-            else:
-                print("❌ Invalid option")
+            handlers.get(choice, invalid_option)()
     
     except KeyboardInterrupt:
         print("\n\n⚠️  Interrupted by user")
@@ -2,11 +2,15 @@
 
 import sys
 import os
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
-
-from src.device import CV5000Device
 import time
 
+try:
+    from cv5000_controller import CV5000Device
+except ImportError:
+    # Not installed (pip install -e .); run from the source tree
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+    from src import CV5000Device
+
 def main():
     print("CV-5000 Quick Start Demo")
     print("=" * 50)
@@ -1,8 +1,9 @@
 """CV-5000 Controller Package"""
 
-from .device import CV5000Device
-from .protocol import CV5000Protocol
+from importlib import import_module
+
 from .commands import CommandBuilder
+from .state import DeviceState
 from .exceptions import (
     CV5000Error,
     ConnectionError,
@@ -14,8 +15,10 @@ from .exceptions import (
 __version__ = "1.0.0"
 __all__ = [
     'CV5000Device',
+    'AsyncCV5000Device',
     'CV5000Protocol',
     'CommandBuilder',
+    'DeviceState',
     'CV5000Error',
     'ConnectionError',
     'CommandError',
@@ -23,3 +26,23 @@ __all__ = [
     'TimeoutError',
 ]
 
+# Serial-backed classes are imported on first access (PEP 562), so code that
+# only builds and validates commands never loads pyserial
+_LAZY = {
+    'CV5000Device': '.device',
+    'AsyncCV5000Device': '.async_device',
+    'CV5000Protocol': '.protocol',
+}
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value  # Cache so later lookups skip __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
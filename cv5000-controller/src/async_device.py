@@ -0,0 +1,297 @@
+"""Asyncio CV-5000 device controller"""
+
+import asyncio
+from collections import deque
+from typing import Optional, Dict, Any, Deque, Mapping
+import types
+
+try:
+    import serial_asyncio_fast as serial_asyncio
+except ImportError:
+    try:
+        import serial_asyncio
+    except ImportError:
+        serial_asyncio = None
+
+from .protocol import (
+    EOT,
+    ECHART_PACKET,
+    RESET_PACKET,
+    VERSION_PACKETS,
+    chart_line_packet,
+    enable_low_latency,
+    format_ascii,
+    pd_packet,
+)
+from .commands import build_prescription_packet as _build_rx_packet, parse_version_response
+from .exceptions import ConnectionError, TimeoutError
+from .state import DeviceState
+
+
+class _FrameProtocol(asyncio.Protocol):
+    """Split incoming bytes into EOT-terminated frames and hand them to
+    waiting queries in the order the queries were sent"""
+    
+    def __init__(self):
+        self.transport: Optional[asyncio.Transport] = None
+        self.waiters: Deque[asyncio.Future] = deque()
+        self._buffer = bytearray()
+    
+    def connection_made(self, transport):
+        self.transport = transport
+    
+    def data_received(self, data: bytes):
+        self._buffer += data
+        while True:
+            end = self._buffer.find(EOT)
+            if end < 0:
+                return
+            frame = bytes(self._buffer[:end + 1])
+            del self._buffer[:end + 1]
+            if self.waiters:
+                waiter = self.waiters.popleft()
+                if not waiter.done():
+                    waiter.set_result(frame)
+    
+    def connection_lost(self, exc):
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_exception(ConnectionError(f"Serial connection lost: {exc}"))
+
+
+class AsyncCV5000Device:
+    """
+    Asyncio controller for the CV-5000 phoropter
+    
+    Same commands as CV5000Device, but awaitable: queries are pipelined
+    (several can be outstanding; responses are matched in send order) and
+    writes never block the event loop. Requires pyserial-asyncio-fast (or
+    pyserial-asyncio).
+    
+    Example:
+        async with AsyncCV5000Device(port="COM4") as device:
+            versions = await device.get_version()
+            await device.set_prescription(r_sph=-1.50)
+    """
+    
+    def __init__(self, port: str = "COM4", baudrate: int = 9600, timeout: float = 1.0,
+                 command_interval: float = 0.05, low_latency: bool = True,
+                 debug: bool = False):
+        """
+        Initialize device controller
+        
+        Args:
+            port: Serial port
+            baudrate: Communication speed
+            timeout: Seconds to wait for a query response
+            command_interval: Minimum spacing between packets, giving the
+                device time to process each one (as CV5000Protocol does)
+            low_latency: Enable the serial driver's low-latency mode on connect
+            debug: Enable debug output
+        """
+        self.port = port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.command_interval = command_interval
+        self.low_latency = low_latency
+        self._debug = debug
+        
+        self._protocol: Optional[_FrameProtocol] = None
+        self._write_lock = asyncio.Lock()
+        self._next_write = 0.0  # Loop time before which the next packet must wait
+        
+        # Current state cache
+        self._state = DeviceState()
+        self._state_view = types.MappingProxyType(self._state)
+        
+        # Settings sent since connecting; repeats of those are skipped
+        self._synced: set = set()
+    
+    async def connect(self):
+        """Connect to device"""
+        if serial_asyncio is None:
+            raise ConnectionError(
+                "AsyncCV5000Device requires pyserial-asyncio-fast "
+                "(pip install pyserial-asyncio-fast)"
+            )
+        loop = asyncio.get_running_loop()
+        try:
+            transport, self._protocol = await serial_asyncio.create_serial_connection(
+                loop, _FrameProtocol, self.port, baudrate=self.baudrate
+            )
+        except Exception as e:
+            raise ConnectionError(f"Failed to connect to {self.port}: {e}")
+        
+        if self.low_latency:
+            enable_low_latency(transport.serial, self._debug)
+        await asyncio.sleep(0.2)  # Let port stabilize
+        self._state.connected = True
+        self._synced.clear()
+        if self._debug:
+            print(f"✅ Connected to {self.port} at {self.baudrate} baud")
+    
+    async def disconnect(self):
+        """Disconnect from device"""
+        if self._protocol is not None and self._protocol.transport is not None:
+            self._protocol.transport.close()
+        self._protocol = None
+        self._state.connected = False
+    
+    def is_connected(self) -> bool:
+        """Check connection status"""
+        return (self._state.connected and self._protocol is not None
+                and not self._protocol.transport.is_closing())
+    
+    async def _send_packet(self, packet: bytes, expect_response: bool = False) -> Optional[bytes]:
+        """Write one packet, spaced from the previous one; await its response if any"""
+        if not self.is_connected():
+            raise ConnectionError("Not connected to device")
+        loop = asyncio.get_running_loop()
+        
+        async with self._write_lock:
+            delay = self._next_write - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            # Queue the waiter before writing so the response can't beat it
+            waiter = None
+            if expect_response:
+                waiter = loop.create_future()
+                waiters = self._protocol.waiters
+                waiters.append(waiter)
+            self._protocol.transport.write(packet)
+            self._next_write = loop.time() + self.command_interval
+        
+        if self._debug:
+            print(f"TX: {packet.hex(' ').upper()}")
+            print(f"    {format_ascii(packet)}")
+        
+        if waiter is None:
+            return None
+        try:
+            response = await asyncio.wait_for(waiter, self.timeout)
+        except asyncio.TimeoutError:
+            # Dequeue the dead waiter; left at the head it would swallow the
+            # next response and put every later query one frame behind
+            try:
+                waiters.remove(waiter)
+            except ValueError:
+                pass  # A response popped it as the timeout fired
+            raise TimeoutError(f"No response within {self.timeout}s")
+        
+        if self._debug:
+            print(f"RX: {response.hex(' ').upper()}")
+            print(f"    {format_ascii(response)}")
+        return response
+    
+    # === Device Information ===
+    
+    async def get_version(self) -> Dict[str, str]:
+        """Get device version information (both queries in flight at once)"""
+        responses = await asyncio.gather(*(
+            self._send_packet(packet, expect_response=True) for _, packet in VERSION_PACKETS
+        ))
+        versions = {}
+        for (key, _), response in zip(VERSION_PACKETS, responses):
+            version = parse_version_response(response)
+            if version is not None:
+                versions[key] = version
+        return versions
+    
+    async def reset(self):
+        """Reset device"""
+        await self._send_packet(RESET_PACKET)
+        self._synced.clear()
+        self._state.update({
+            'r_sph': 0.0, 'r_cyl': 0.0, 'r_axis': 0,
+            'l_sph': 0.0, 'l_cyl': 0.0, 'l_axis': 0
+        })
+    
+    # === Prescription Control ===
+    
+    async def set_prescription(self,
+                               r_sph: Optional[float] = None,
+                               r_cyl: Optional[float] = None,
+                               r_axis: Optional[int] = None,
+                               l_sph: Optional[float] = None,
+                               l_cyl: Optional[float] = None,
+                               l_axis: Optional[int] = None,
+                               force: bool = False) -> bool:
+        """Set prescription values (only specified parameters; skipped if
+        unchanged unless force)"""
+        state = self._state
+        params = {
+            'r_sph': r_sph if r_sph is not None else state.r_sph,
+            'r_cyl': r_cyl if r_cyl is not None else state.r_cyl,
+            'r_axis': r_axis if r_axis is not None else state.r_axis,
+            'l_sph': l_sph if l_sph is not None else state.l_sph,
+            'l_cyl': l_cyl if l_cyl is not None else state.l_cyl,
+            'l_axis': l_axis if l_axis is not None else state.l_axis,
+        }
+        if (not force and 'prescription' in self._synced
+                and all(getattr(state, k) == v for k, v in params.items())):
+            return True
+        await self._send_packet(_build_rx_packet(**params))
+        state.update(params)
+        self._synced.add('prescription')
+        return True
+    
+    async def set_sphere_both(self, value: float, force: bool = False) -> bool:
+        """Set sphere for both eyes"""
+        return await self.set_prescription(r_sph=value, l_sph=value, force=force)
+    
+    async def set_cylinder_both(self, value: float, force: bool = False) -> bool:
+        """Set cylinder for both eyes"""
+        return await self.set_prescription(r_cyl=value, l_cyl=value, force=force)
+    
+    async def reset_to_zero(self, force: bool = False) -> bool:
+        """Reset all prescription values to zero"""
+        return await self.set_prescription(
+            r_sph=0.0, r_cyl=0.0, r_axis=0,
+            l_sph=0.0, l_cyl=0.0, l_axis=0,
+            force=force
+        )
+    
+    # === PD Control ===
+    
+    async def set_pd(self, value: float, force: bool = False) -> bool:
+        """Set pupillary distance (skipped if unchanged unless force)"""
+        if not force and 'pd' in self._synced and value == self._state.pd:
+            return True
+        await self._send_packet(pd_packet(value))
+        self._state.pd = value
+        self._synced.add('pd')
+        return True
+    
+    # === Chart Control ===
+    
+    async def show_echart(self) -> bool:
+        """Display E-chart"""
+        await self._send_packet(ECHART_PACKET)
+        # Switching charts may move the selected line
+        self._synced.discard('chart_line')
+        return True
+    
+    async def set_chart_line(self, line: int, force: bool = False) -> bool:
+        """Select chart line (skipped if unchanged unless force)"""
+        if not force and 'chart_line' in self._synced and line == self._state.chart_line:
+            return True
+        await self._send_packet(chart_line_packet(line))
+        self._state.chart_line = line
+        self._synced.add('chart_line')
+        return True
+    
+    # === State Queries ===
+    
+    def get_state(self, view: bool = False) -> Mapping[str, Any]:
+        """Get current device state (cached); a snapshot dict unless view=True"""
+        return self._state_view if view else dict(self._state)
+    
+    # === Context Manager ===
+    
+    async def __aenter__(self):
+        await self.connect()
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.disconnect()
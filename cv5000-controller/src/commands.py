@@ -1,36 +1,100 @@
 """Command builders and validators for CV-5000"""
 
-from typing import Tuple
+from functools import lru_cache
+from typing import Optional, Tuple
 from .exceptions import ValidationError
 
 
+# Complete B command packet (SOH, CR-delimited fields, EOT) with slots for
+# the variable fields, so building one is a single format call
+PRESCRIPTION_PACKET_TEMPLATE = (
+    "\x01B\rR\r%s\r%s\r%s\rL\r%s\r%s\r%s\r%02d\r%02d\r%d\r\x04"
+)
+
+# Formatted sphere/cylinder strings keyed by quarter-diopter step count
+# (-20.00..+20.00; cylinder's -6.00..0.00 is a subset) and axis strings
+_SPH_CYL_FMT = {
+    q: f"  {q * 0.25:.2f}" if q >= 0 else f"- {-q * 0.25:.2f}"
+    for q in range(-80, 81)
+}
+_AXIS_FMT = {axis: f"{axis:4d}" for axis in range(181)}
+
+# Every valid value, so validating one is a set lookup (quarter steps are
+# exact in binary floating point)
+_VALID_SPHERE = frozenset(q * 0.25 for q in range(-80, 81))
+_VALID_CYLINDER = frozenset(q * 0.25 for q in range(-24, 1))
+_VALID_AXIS = frozenset(range(181))
+# ASCII bytes of every table entry, for filling packets without encoding
+_FMT_BYTES = {
+    text: text.encode('ascii')
+    for table in (_SPH_CYL_FMT, _AXIS_FMT) for text in table.values()
+}
+
+_ECHART_COMMAND = ("c", "E")
+_RESET_COMMAND = ("r",)
+
+
+def _sph_to_str(value: float) -> str:
+    """Validate and format a sphere value in one table lookup"""
+    q = value * 4
+    if -80 <= q <= 80:
+        text = _SPH_CYL_FMT.get(q)  # Only exact quarter steps are keys
+        if text is not None:
+            return text
+        raise ValidationError(f"Sphere {value} must be in 0.25 steps")
+    raise ValidationError(f"Sphere {value} out of range (-20.00 to +20.00)")
+
+
+def _cyl_to_str(value: float) -> str:
+    """Validate and format a cylinder value in one table lookup"""
+    q = value * 4
+    if -24 <= q <= 0:
+        text = _SPH_CYL_FMT.get(q)
+        if text is not None:
+            return text
+        raise ValidationError(f"Cylinder {value} must be in 0.25 steps")
+    raise ValidationError(f"Cylinder {value} out of range (-6.00 to 0.00)")
+
+
+def _axis_to_str(value: int) -> str:
+    """Validate and format an axis value in one table lookup"""
+    text = _AXIS_FMT.get(value)
+    if text is not None:
+        return text
+    if not 0 <= value <= 180:
+        raise ValidationError(f"Axis {value} out of range (0 to 180)")
+    return f"{value:4d}"
+
+
 class CommandBuilder:
     """Build and validate CV-5000 commands"""
     
     @staticmethod
     def validate_sphere(value: float) -> float:
         """Validate sphere value"""
-        if not -20.0 <= value <= 20.0:
-            raise ValidationError(f"Sphere {value} out of range (-20.00 to +20.00)")
-        if round(value / 0.25) * 0.25 != value:
+        if value in _VALID_SPHERE:
+            return value
+        if -20.0 <= value <= 20.0:
             raise ValidationError(f"Sphere {value} must be in 0.25 steps")
-        return value
+        raise ValidationError(f"Sphere {value} out of range (-20.00 to +20.00)")
     
     @staticmethod
     def validate_cylinder(value: float) -> float:
         """Validate cylinder value"""
-        if not -6.0 <= value <= 0.0:
-            raise ValidationError(f"Cylinder {value} out of range (-6.00 to 0.00)")
-        if round(value / 0.25) * 0.25 != value:
+        if value in _VALID_CYLINDER:
+            return value
+        if -6.0 <= value <= 0.0:
             raise ValidationError(f"Cylinder {value} must be in 0.25 steps")
-        return value
+        raise ValidationError(f"Cylinder {value} out of range (-6.00 to 0.00)")
     
     @staticmethod
     def validate_axis(value: int) -> int:
         """Validate axis value"""
-        if not 0 <= value <= 180:
-            raise ValidationError(f"Axis {value} out of range (0 to 180)")
-        return value
+        if value in _VALID_AXIS:
+            return value
+        if 0 <= value <= 180:
+            raise ValidationError(f"Axis {value} must be a whole number of degrees")
+        raise ValidationError(f"Axis {value} out of range (0 to 180)")
     
     @staticmethod
     def validate_pd(value: float) -> float:
@@ -42,6 +106,11 @@ class CommandBuilder:
     @staticmethod
     def format_sphere_cyl(value: float) -> str:
         """Format sphere/cylinder value (6 chars with sign and spaces)"""
+        q = value * 4
+        if q == int(q):
+            text = _SPH_CYL_FMT.get(int(q))
+            if text is not None:
+                return text
         if value >= 0:
             return f"  {value:.2f}"
         else:
@@ -50,9 +119,15 @@ class CommandBuilder:
     @staticmethod
     def format_axis(value: int) -> str:
         """Format axis value (4 chars, space-padded)"""
+        text = _AXIS_FMT.get(value)
+        if text is not None:
+            return text
         return f"{value:4d}"
     
+    # Builders are pure, so repeated settings (toggling between a few
+    # prescriptions) are served from a cache; invalid values still raise
     @staticmethod
+    @lru_cache(maxsize=256)
     def build_prescription_command(
         r_sph: float = 0.0, r_cyl: float = 0.0, r_axis: int = 0,
         l_sph: float = 0.0, l_cyl: float = 0.0, l_axis: int = 0,
@@ -64,21 +139,13 @@ class CommandBuilder:
         Returns:
             Tuple of command parts ready to send
         """
-        # Validate all values
-        r_sph = CommandBuilder.validate_sphere(r_sph)
-        r_cyl = CommandBuilder.validate_cylinder(r_cyl)
-        r_axis = CommandBuilder.validate_axis(r_axis)
-        l_sph = CommandBuilder.validate_sphere(l_sph)
-        l_cyl = CommandBuilder.validate_cylinder(l_cyl)
-        l_axis = CommandBuilder.validate_axis(l_axis)
-        
-        # Format values
-        r_sph_str = CommandBuilder.format_sphere_cyl(r_sph)
-        r_cyl_str = CommandBuilder.format_sphere_cyl(r_cyl)
-        r_axis_str = CommandBuilder.format_axis(r_axis)
-        l_sph_str = CommandBuilder.format_sphere_cyl(l_sph)
-        l_cyl_str = CommandBuilder.format_sphere_cyl(l_cyl)
-        l_axis_str = CommandBuilder.format_axis(l_axis)
+        # Validate and format in one pass
+        r_sph_str = _sph_to_str(r_sph)
+        r_cyl_str = _cyl_to_str(r_cyl)
+        r_axis_str = _axis_to_str(r_axis)
+        l_sph_str = _sph_to_str(l_sph)
+        l_cyl_str = _cyl_to_str(l_cyl)
+        l_axis_str = _axis_to_str(l_axis)
         
         # Build command tuple
         return (
@@ -95,12 +162,67 @@ class CommandBuilder:
         )
     
     @staticmethod
+    @lru_cache(maxsize=256)
+    def build_prescription_packet(
+        r_sph: float = 0.0, r_cyl: float = 0.0, r_axis: int = 0,
+        l_sph: float = 0.0, l_cyl: float = 0.0, l_axis: int = 0,
+        mode1: int = 1, mode2: int = 1, display: int = 0
+    ) -> bytes:
+        """
+        Build a complete prescription packet
+        
+        Same bytes as build_packet(*build_prescription_command(...)), filled
+        into PRESCRIPTION_PACKET_TEMPLATE instead of joined part by part.
+        
+        Returns:
+            Packet bytes ready to send
+        """
+        return (PRESCRIPTION_PACKET_TEMPLATE % (
+            _sph_to_str(r_sph), _cyl_to_str(r_cyl), _axis_to_str(r_axis),
+            _sph_to_str(l_sph), _cyl_to_str(l_cyl), _axis_to_str(l_axis),
+            mode1, mode2, display
+        )).encode('ascii')
+    
+    @staticmethod
+    def build_prescription_into(
+        buf: bytearray,
+        r_sph: float = 0.0, r_cyl: float = 0.0, r_axis: int = 0,
+        l_sph: float = 0.0, l_cyl: float = 0.0, l_axis: int = 0,
+        mode1: int = 1, mode2: int = 1, display: int = 0
+    ) -> int:
+        """
+        Append a complete prescription packet to buf
+        
+        Same bytes as build_prescription_packet(...), written straight into
+        a caller-owned buffer so many packets can share one allocation.
+        Nothing is written if a value is invalid.
+        
+        Returns:
+            Length of the packet written
+        """
+        fields = (
+            _sph_to_str(r_sph), _cyl_to_str(r_cyl), _axis_to_str(r_axis),
+            _sph_to_str(l_sph), _cyl_to_str(l_cyl), _axis_to_str(l_axis),
+        )
+        start = len(buf)
+        buf += b'\x01B\rR\r'
+        for i, text in enumerate(fields):
+            if i == 3:
+                buf += b'L\r'
+            buf += _FMT_BYTES.get(text) or text.encode('ascii')
+            buf += b'\r'
+        buf += b'%02d\r%02d\r%d\r\x04' % (mode1, mode2, display)
+        return len(buf) - start
+    
+    @staticmethod
+    @lru_cache(maxsize=64)
     def build_pd_command(pd_value: float) -> Tuple:
         """Build PD command parameters"""
         pd_value = CommandBuilder.validate_pd(pd_value)
         return ("D", f"{pd_value:.1f}")
     
     @staticmethod
+    @lru_cache(maxsize=None)
     def build_chart_line_command(line: int) -> Tuple:
         """Build chart line selection command"""
         if not 1 <= line <= 20:
@@ -110,17 +232,60 @@ class CommandBuilder:
     @staticmethod
     def build_echart_command() -> Tuple:
         """Build E-chart display command"""
-        return ("c", "E")
+        return _ECHART_COMMAND
     
     @staticmethod
     def build_reset_command() -> Tuple:
         """Build reset command"""
-        return ("r",)
+        return _RESET_COMMAND
     
     @staticmethod
+    @lru_cache(maxsize=None)
     def build_version_command(query_type: str = "PS") -> Tuple:
         """Build version query command"""
         if query_type not in ["PS", "CV"]:
             raise ValidationError(f"Invalid version query type: {query_type}")
         return ("v", query_type)
 
+
+
+
+def response_field(response, index: int, end: Optional[int] = None) -> Optional[str]:
+    """Return field index of a CR-delimited response, decoded
+    
+    Locates the field with find() rather than splitting, so only that field
+    is copied. response may be bytes or a bytearray holding end valid bytes.
+    """
+    if end is None:
+        end = len(response)
+    start = 0
+    for _ in range(index):
+        start = response.find(b'\r', start, end)
+        if start < 0:
+            return None
+        start += 1
+    stop = response.find(b'\r', start, end)
+    if stop < 0:
+        stop = end
+    return response[start:stop].strip().decode('ascii', errors='ignore')
+
+def parse_version_response(response: Optional[bytes], end: Optional[int] = None) -> Optional[str]:
+    """Extract the version string from a version query response
+    
+    Responses are CR-delimited like commands (<SOH>v<CR>PS<CR>version<CR><EOT>);
+    only the version field is decoded.
+    """
+    if not response:
+        return None
+    return response_field(response, 2, end)
+
+# Module-level builders, so callers can bind them once at import instead of
+# resolving them through the class on every command
+build_prescription_command = CommandBuilder.build_prescription_command
+build_prescription_packet = CommandBuilder.build_prescription_packet
+build_prescription_into = CommandBuilder.build_prescription_into
+build_pd_command = CommandBuilder.build_pd_command
+build_chart_line_command = CommandBuilder.build_chart_line_command
+build_echart_command = CommandBuilder.build_echart_command
+build_reset_command = CommandBuilder.build_reset_command
+build_version_command = CommandBuilder.build_version_command
@@ -1,84 +1,198 @@
 """High-level CV-5000 device controller"""
 
-from typing import Optional, Dict, Any
-from .protocol import CV5000Protocol
-from .commands import CommandBuilder
+import asyncio
+import threading
+import time
+import types
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, Mapping, Sequence, Union
+from .protocol import (
+    CV5000Protocol,
+    ECHART_PACKET as _ECHART_PACKET,
+    RESET_PACKET as _RESET_PACKET,
+    VERSION_PACKETS as _VERSION_PACKETS,
+    chart_line_packet as _chart_line_packet,
+    pd_packet as _pd_packet,
+)
+from .commands import (
+    build_prescription_packet as _build_rx_packet,
+    build_prescription_into as _build_rx_into,
+    CommandBuilder,
+    parse_version_response,
+)
 from .exceptions import CV5000Error
+from .state import DeviceState
+
+# Zero prescription, framed once; sent with send_packet, skipping build_packet
+_ZERO_RX = {
+    'r_sph': 0.0, 'r_cyl': 0.0, 'r_axis': 0,
+    'l_sph': 0.0, 'l_cyl': 0.0, 'l_axis': 0,
+}
+_ZERO_RX_PACKET = _build_rx_packet(**_ZERO_RX)
+_RX_FIELDS = tuple(_ZERO_RX)
+
+
+def _copy_outcome(source: Future, target: Future):
+    """Resolve target the way source was resolved"""
+    if source.cancelled():
+        target.cancel()
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
 
 
 class CV5000Device:
     """High-level controller for CV-5000 phoropter"""
     
-    def __init__(self, port: str = "COM4", debug: bool = False):
+    __slots__ = (
+        'protocol', 'pipelined', 'coalesce_ms',
+        '_state', '_state_view', '_synced',
+        '_batch_depth', '_pending_packet', '_pending_future', '_pending_lock', '_flush_timer',
+        '_io', '_io_lock', '_write_error',
+    )
+    
+    # Kept for callers that use device.builder; internals call the bound
+    # module-level builders above
+    builder = CommandBuilder
+    
+    def __init__(self, port: str = "COM4", debug: bool = False, pipelined: bool = False,
+                 low_latency: bool = True, coalesce_ms: int = 0):
         """
         Initialize device controller
         
         Args:
             port: Serial port
             debug: Enable debug output
+            pipelined: Return from write-only commands as soon as they are
+                queued (state cache updated immediately); call sync() to
+                wait for them and surface write errors
+            low_latency: Enable the serial driver's low-latency mode on connect
+            coalesce_ms: If > 0, prescription updates are held for up to this
+                long and only the latest is sent, so a burst of updates (a
+                slider, a sweep) costs one command per window; flush() sends
+                immediately
         """
-        self.protocol = CV5000Protocol(port=port)
+        self.protocol = CV5000Protocol(port=port, low_latency=low_latency)
         self.protocol.set_debug(debug)
-        self.builder = CommandBuilder()
+        self.pipelined = pipelined
+        self.coalesce_ms = coalesce_ms
         
         # Current state cache
-        self._state = {
-            'r_sph': 0.0, 'r_cyl': 0.0, 'r_axis': 0,
-            'l_sph': 0.0, 'l_cyl': 0.0, 'l_axis': 0,
-            'pd': 64.0,
-            'chart_line': 1,
-            'connected': False
-        }
+        self._state = DeviceState()
+        self._state_view = types.MappingProxyType(self._state)
+        
+        # Prescription batching: while _batch_depth > 0 (or coalescing),
+        # set_prescription only updates the cache and keeps the latest packet
+        # for flush(); callers get _pending_future, resolved once it is sent
+        self._batch_depth = 0
+        self._pending_packet: Optional[bytes] = None
+        self._pending_future: Optional[Future] = None
+        self._flush_timer: Optional[threading.Timer] = None
+        self._pending_lock = threading.Lock()  # The coalescing timer flushes from its own thread
+        
+        # Settings ('prescription', 'pd', 'chart_line') sent since connecting,
+        # for which the cache reflects the device; repeats of those are skipped
+        self._synced: set = set()
+        
+        # All serial I/O runs on one worker thread, in submission order, so
+        # callers can pass wait=False to queue a write and carry on
+        self._io: Optional[ThreadPoolExecutor] = None
+        self._io_lock = threading.Lock()  # The coalescing timer may submit first
+        self._write_error: Optional[BaseException] = None  # First unwaited write failure
     
     def connect(self):
         """Connect to device"""
         self.protocol.connect()
-        self._state['connected'] = True
+        self._state.connected = True
+        self._synced.clear()
     
     def disconnect(self):
-        """Disconnect from device"""
-        self.protocol.disconnect()
-        self._state['connected'] = False
+        """Disconnect from device (after queued writes have gone out)"""
+        self._flush(wait=False)
+        self._submit(self.protocol.disconnect).result()
+        with self._io_lock:
+            io, self._io = self._io, None
+        io.shutdown()
+        self._state.connected = False
     
     def is_connected(self) -> bool:
         """Check connection status"""
-        return self._state['connected'] and self.protocol.is_connected()
+        return self._state.connected and self.protocol.is_connected()
+    
+    # === Serial I/O ===
+    
+    def _submit(self, fn, *args, **kwargs) -> Future:
+        """Queue a call on the serial I/O thread"""
+        io = self._io
+        if io is None:
+            # Locked so the caller and the timer thread can't each start one
+            with self._io_lock:
+                if self._io is None:
+                    self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix='cv5000-io')
+                io = self._io
+        return io.submit(fn, *args, **kwargs)
+    
+    def _write(self, fn, *args, wait: bool = True) -> Future:
+        """Queue a write; with wait, block until it is sent (re-raising errors)
+        
+        Pipelined devices never block here; failures are kept for sync().
+        """
+        future = self._submit(fn, *args)
+        if wait and not self.pipelined:
+            future.result()
+        else:
+            future.add_done_callback(self._note_write_error)
+        return future
+    
+    def _note_write_error(self, future: Future):
+        """Remember the first failure of a write nobody waited for"""
+        if self._write_error is None and not future.cancelled():
+            self._write_error = future.exception()
+    
+    def sync(self):
+        """
+        Wait until every queued write has been sent
+        
+        Raises:
+            The first error from a write that was not waited for
+        """
+        self._flush(wait=False)
+        self._submit(lambda: None).result()
+        error, self._write_error = self._write_error, None
+        if error is not None:
+            raise error
+    
+    @staticmethod
+    def _done() -> Future:
+        """Return an already completed future, for writes that were skipped"""
+        future: Future = Future()
+        future.set_result(None)
+        return future
     
     # === Device Information ===
     
     def get_version(self) -> Dict[str, str]:
         """Get device version information"""
         versions = {}
-        
-        # Get software version
-        cmd = self.builder.build_version_command("PS")
-        response = self.protocol.send_command(*cmd, expect_response=True)
-        if response:
-            decoded = response.decode('ascii', errors='ignore')
-            parts = decoded.split('\r')
-            if len(parts) >= 3:
-                versions['software'] = parts[2].strip()
-        
-        # Get controller version
-        cmd = self.builder.build_version_command("CV")
-        response = self.protocol.send_command(*cmd, expect_response=True)
-        if response:
-            decoded = response.decode('ascii', errors='ignore')
-            parts = decoded.split('\r')
-            if len(parts) >= 3:
-                versions['controller'] = parts[2].strip()
+        for key, packet in _VERSION_PACKETS:
+            # Parsed on the I/O thread, straight from the protocol's RX buffer
+            version = self._submit(self.protocol.send_packet, packet, expect_response=True,
+                                   parse=parse_version_response).result()
+            if version is not None:
+                versions[key] = version
         
         return versions
     
-    def reset(self):
+    def reset(self, wait: bool = True) -> Union[bool, Future]:
         """Reset device"""
-        cmd = self.builder.build_reset_command()
-        self.protocol.send_command(*cmd)
+        future = self._write(self.protocol.send_packet, _RESET_PACKET, wait=wait)
+        self._drop_pending()
+        self._synced.clear()
         # Reset state cache
-        self._state.update({
-            'r_sph': 0.0, 'r_cyl': 0.0, 'r_axis': 0,
-            'l_sph': 0.0, 'l_cyl': 0.0, 'l_axis': 0
-        })
+        self._state.update(_ZERO_RX)
+        return True if wait else future
     
     # === Prescription Control ===
     
@@ -88,10 +202,17 @@ class CV5000Device:
                         r_axis: Optional[int] = None,
                         l_sph: Optional[float] = None,
                         l_cyl: Optional[float] = None,
-                        l_axis: Optional[int] = None) -> bool:
+                        l_axis: Optional[int] = None,
+                        force: bool = False,
+                        wait: bool = True) -> Union[bool, Future]:
         """
         Set prescription values (only specified parameters)
         
+        Nothing is sent if the values match what was last sent, unless
+        ``force`` is set (e.g. to resync after the device was changed by hand).
+        With ``wait=False`` the write is queued on the I/O thread and a
+        Future for it is returned instead of blocking until it is sent.
+        
         Args:
             r_sph: Right sphere
             r_cyl: Right cylinder
@@ -99,71 +220,321 @@ class CV5000Device:
             l_sph: Left sphere
             l_cyl: Left cylinder
             l_axis: Left axis
+            force: Send even if unchanged
+            wait: Block until the command is sent
         
         Returns:
-            True if successful
+            True if successful, or a Future when wait=False
         """
         # Use current state for unspecified values
+        state = self._state
         params = {
-            'r_sph': r_sph if r_sph is not None else self._state['r_sph'],
-            'r_cyl': r_cyl if r_cyl is not None else self._state['r_cyl'],
-            'r_axis': r_axis if r_axis is not None else self._state['r_axis'],
-            'l_sph': l_sph if l_sph is not None else self._state['l_sph'],
-            'l_cyl': l_cyl if l_cyl is not None else self._state['l_cyl'],
-            'l_axis': l_axis if l_axis is not None else self._state['l_axis'],
+            'r_sph': r_sph if r_sph is not None else state.r_sph,
+            'r_cyl': r_cyl if r_cyl is not None else state.r_cyl,
+            'r_axis': r_axis if r_axis is not None else state.r_axis,
+            'l_sph': l_sph if l_sph is not None else state.l_sph,
+            'l_cyl': l_cyl if l_cyl is not None else state.l_cyl,
+            'l_axis': l_axis if l_axis is not None else state.l_axis,
         }
+        return self._apply_prescription(params, None, force, wait)
+    
+    def _apply_prescription(self, params: Dict[str, Any], packet: Optional[bytes],
+                            force: bool, wait: bool) -> Union[bool, Future]:
+        """Send (or batch) a full prescription and update the cache"""
+        if (not force and 'prescription' in self._synced
+                and all(getattr(self._state, k) == v for k, v in params.items())):
+            return True if wait else self._done()
+        
+        if packet is None:
+            packet = _build_rx_packet(**params)
+        if self._batch_depth or self.coalesce_ms > 0:
+            future = self._hold(packet)
+        else:
+            future = self._write(self.protocol.send_packet, packet, wait=wait)
+            self._synced.add('prescription')
+        
+        # Update state cache
+        self._state.update(params)
+        return True if wait else future
+    
+    @contextmanager
+    def batch(self):
+        """
+        Coalesce prescription updates into one B command
+        
+        Inside the block set_prescription (and the helpers built on it) only
+        update the cached state; the merged prescription is sent once on exit.
+        Blocks may be nested; the outermost one sends.
+        
+        Example:
+            with device.batch():
+                device.set_prescription(r_sph=-1.00)
+                device.set_prescription(l_sph=-1.25)
+                device.set_cylinder_both(-0.50)
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self.flush()
+    
+    def apply_batch(self, force: bool = False, wait: bool = True,
+                    **updates) -> Union[bool, Future]:
+        """
+        Apply several settings in one go
+        
+        Prescription fields are merged into a single B command; pd and
+        chart_line, which have their own commands, are written right behind
+        it in the same I/O job. Every value is validated before anything is
+        sent, and unchanged settings are skipped unless ``force``.
+        
+        Example:
+            device.apply_batch(r_sph=-1.00, l_sph=-1.25, pd=63.0, chart_line=4)
+        
+        Args:
+            force: Send even if unchanged
+            wait: Block until the commands are sent
+            **updates: Prescription fields, pd and/or chart_line
+        
+        Returns:
+            True if successful, or a Future when wait=False
+        """
+        unknown = updates.keys() - set(_RX_FIELDS) - {'pd', 'chart_line'}
+        if unknown:
+            raise ValueError(f"Unknown setting(s): {', '.join(sorted(unknown))}")
+        
+        state = self._state
+        params = {k: updates.get(k, getattr(state, k)) for k in _RX_FIELDS}
+        rx_packet = None
+        if not params.keys().isdisjoint(updates):
+            rx_packet = _build_rx_packet(**params)
+        pd = updates.get('pd')
+        pd_packet = _pd_packet(pd) if pd is not None else None
+        line = updates.get('chart_line')
+        line_packet = _chart_line_packet(line) if line is not None else None
         
-        cmd = self.builder.build_prescription_command(**params)
-        self.protocol.send_command(*cmd)
+        packets = []
+        if rx_packet is not None:
+            if self._batch_depth or self.coalesce_ms > 0:
+                self._apply_prescription(params, rx_packet, force, wait=False)
+                rx_packet = None
+            elif (not force and 'prescription' in self._synced
+                    and all(getattr(state, k) == v for k, v in params.items())):
+                rx_packet = None
+            else:
+                packets.append(rx_packet)
+        if pd_packet is not None:
+            if not force and 'pd' in self._synced and pd == state.pd:
+                pd_packet = None
+            else:
+                packets.append(pd_packet)
+        if line_packet is not None:
+            if not force and 'chart_line' in self._synced and line == state.chart_line:
+                line_packet = None
+            else:
+                packets.append(line_packet)
+        if not packets:
+            return True if wait else self._done()
+        
+        future = self._write(self._send_packets, packets, wait=wait)
+        
+        # Update state cache
+        if rx_packet is not None:
+            state.update(params)
+            self._synced.add('prescription')
+        if pd_packet is not None:
+            state.pd = pd
+            self._synced.add('pd')
+        if line_packet is not None:
+            state.chart_line = line
+            self._synced.add('chart_line')
+        return True if wait else future
+    
+    def _send_packets(self, packets: Sequence[bytes]):
+        """Write packets back to back (runs on the I/O thread)"""
+        for packet in packets:
+            self.protocol.send_packet(packet)
+    
+    def flush(self) -> bool:
+        """
+        Send the prescription batched or coalesced so far, if any
+        
+        Returns:
+            True if a command was sent
+        """
+        return self._flush(wait=True)
+    
+    def _hold(self, packet: bytes) -> Future:
+        """Keep a prescription packet for the next flush"""
+        with self._pending_lock:
+            self._pending_packet = packet
+            if self._pending_future is None:
+                self._pending_future = Future()
+            # Arm once per window, so steady updates still go out every window
+            if not self._batch_depth and self._flush_timer is None:
+                self._flush_timer = threading.Timer(
+                    self.coalesce_ms / 1000.0, self._flush, kwargs={'wait': False})
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+            return self._pending_future
+    
+    def _take_pending(self):
+        """Detach the held packet and its future, disarming the timer"""
+        with self._pending_lock:
+            packet, future, timer = self._pending_packet, self._pending_future, self._flush_timer
+            self._pending_packet = self._pending_future = self._flush_timer = None
+        if timer is not None:
+            timer.cancel()
+        return packet, future
+    
+    def _drop_pending(self):
+        """Discard a held packet that a newer command supersedes"""
+        packet, future = self._take_pending()
+        if future is not None:
+            future.set_result(None)
+    
+    def _flush(self, wait: bool) -> bool:
+        """Send the held packet; without wait, errors are left for sync()"""
+        packet, future = self._take_pending()
+        if packet is None:
+            return False
+        write = self._submit(self.protocol.send_packet, packet)
+        write.add_done_callback(lambda done: _copy_outcome(done, future))
+        self._synced.add('prescription')
+        if wait and not self.pipelined:
+            write.result()
+        else:
+            write.add_done_callback(self._note_write_error)
+        return True
+    
+    async def aset_prescription(self, **kwargs) -> bool:
+        """
+        Awaitable set_prescription
+        
+        The write is queued on the I/O thread, so callers can overlap it
+        with a settle delay: ``await asyncio.gather(asyncio.sleep(0.5),
+        device.aset_prescription(r_sph=-1.50))``.
+        
+        Args:
+            **kwargs: Same keyword arguments as set_prescription
+        
+        Returns:
+            True if successful
+        """
+        await asyncio.wrap_future(self.set_prescription(**kwargs, wait=False))
+        return True
+    
+    def set_prescription_sweep(self, field: str, values: Sequence[float],
+                               dwell_ms: int = 300) -> bool:
+        """
+        Step one prescription field through a sequence of values
+        
+        Every packet is validated and built before the first write, then
+        written without an intermediate flush; the dwell is scheduled against
+        absolute deadlines so the write time does not stretch the sweep.
+        The B command carries a full prescription, so each step is still its
+        own packet.
+        
+        Args:
+            field: Prescription field ('r_sph', 'l_cyl', ...)
+            values: Values to show, in order
+            dwell_ms: Time each value is held
+        
+        Returns:
+            True if successful
+        """
+        if field not in _RX_FIELDS:
+            raise ValueError(f"Unknown prescription field: {field}")
+        
+        params = {k: getattr(self._state, k) for k in _RX_FIELDS}
+        # All steps share one buffer; each packet is a view into it
+        buf = bytearray()
+        bounds = []
+        for value in values:
+            params[field] = value
+            start = len(buf)
+            bounds.append((start, start + _build_rx_into(buf, **params)))
+        view = memoryview(buf)
+        packets = [view[start:end] for start, end in bounds]
+        
+        # The sweep ends on the merged state, superseding any batched update
+        self._drop_pending()
+        
+        self._submit(self._run_sweep, packets, dwell_ms / 1000.0).result()
         
         # Update state cache
         self._state.update(params)
+        if packets:
+            self._synced.add('prescription')
         return True
     
-    def set_sphere_both(self, value: float) -> bool:
+    def _run_sweep(self, packets: Sequence[memoryview], dwell: float):
+        """Write sweep packets, holding each for ``dwell`` seconds (I/O thread)"""
+        deadline = time.monotonic()
+        for packet in packets:
+            self.protocol.send_packet(packet, flush=False)
+            deadline += dwell
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+    
+    def set_sphere_both(self, value: float, force: bool = False,
+                        wait: bool = True) -> Union[bool, Future]:
         """Set sphere for both eyes"""
-        return self.set_prescription(r_sph=value, l_sph=value)
+        return self.set_prescription(r_sph=value, l_sph=value, force=force, wait=wait)
     
-    def set_cylinder_both(self, value: float) -> bool:
+    def set_cylinder_both(self, value: float, force: bool = False,
+                          wait: bool = True) -> Union[bool, Future]:
         """Set cylinder for both eyes"""
-        return self.set_prescription(r_cyl=value, l_cyl=value)
+        return self.set_prescription(r_cyl=value, l_cyl=value, force=force, wait=wait)
     
-    def reset_to_zero(self) -> bool:
+    def reset_to_zero(self, force: bool = False, wait: bool = True) -> Union[bool, Future]:
         """Reset all prescription values to zero"""
-        return self.set_prescription(
-            r_sph=0.0, r_cyl=0.0, r_axis=0,
-            l_sph=0.0, l_cyl=0.0, l_axis=0
-        )
+        return self._apply_prescription(_ZERO_RX, _ZERO_RX_PACKET, force, wait)
     
     # === PD Control ===
     
-    def set_pd(self, value: float) -> bool:
-        """Set pupillary distance"""
-        cmd = self.builder.build_pd_command(value)
-        self.protocol.send_command(*cmd)
-        self._state['pd'] = value
-        return True
+    def set_pd(self, value: float, force: bool = False,
+               wait: bool = True) -> Union[bool, Future]:
+        """Set pupillary distance (skipped if unchanged unless force)"""
+        if not force and 'pd' in self._synced and value == self._state.pd:
+            return True if wait else self._done()
+        future = self._write(self.protocol.send_packet, _pd_packet(value), wait=wait)
+        self._state.pd = value
+        self._synced.add('pd')
+        return True if wait else future
     
     # === Chart Control ===
     
-    def show_echart(self) -> bool:
+    def show_echart(self, wait: bool = True) -> Union[bool, Future]:
         """Display E-chart"""
-        cmd = self.builder.build_echart_command()
-        self.protocol.send_command(*cmd)
-        return True
+        future = self._write(self.protocol.send_packet, _ECHART_PACKET, wait=wait)
+        # Switching charts may move the selected line
+        self._synced.discard('chart_line')
+        return True if wait else future
     
-    def set_chart_line(self, line: int) -> bool:
-        """Select chart line"""
-        cmd = self.builder.build_chart_line_command(line)
-        self.protocol.send_command(*cmd)
-        self._state['chart_line'] = line
-        return True
+    def set_chart_line(self, line: int, force: bool = False,
+                       wait: bool = True) -> Union[bool, Future]:
+        """Select chart line (skipped if unchanged unless force)"""
+        if not force and 'chart_line' in self._synced and line == self._state.chart_line:
+            return True if wait else self._done()
+        future = self._write(self.protocol.send_packet, _chart_line_packet(line), wait=wait)
+        self._state.chart_line = line
+        self._synced.add('chart_line')
+        return True if wait else future
     
     # === State Queries ===
     
-    def get_state(self) -> Dict[str, Any]:
-        """Get current device state (cached)"""
-        return self._state.copy()
+    def get_state(self, view: bool = False) -> Mapping[str, Any]:
+        """
+        Get current device state (cached)
+        
+        Returns a snapshot dict; pass ``view=True`` for a read-only live
+        view instead, which later commands update and which costs no copy.
+        """
+        return self._state_view if view else dict(self._state)
     
     # === Context Manager ===
     
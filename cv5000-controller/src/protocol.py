@@ -1,20 +1,128 @@
 """Low-level CV-5000 serial protocol implementation"""
 
+import os
+import sys
 import serial
 import time
-from typing import Optional, List
-from .exceptions import ConnectionError, CommandError, TimeoutError
+from functools import lru_cache
+from typing import Any, Callable, Optional
+from .commands import (
+    build_chart_line_command,
+    build_echart_command,
+    build_pd_command,
+    build_reset_command,
+    build_version_command,
+)
+from .exceptions import ConnectionError, CommandError
+
+SOH = b'\x01'  # Start of Header
+CR = b'\x0d'   # Carriage Return (delimiter)
+EOT = b'\x04'  # End of Transmission
+
+# Debug rendering of every byte value: control bytes named, other
+# non-printables as hex
+_ASCII_TABLE = tuple(
+    {0x01: '<SOH>', 0x0d: '<CR>', 0x04: '<EOT>'}.get(
+        b, chr(b) if 32 <= b <= 126 else f'<{b:02X}>')
+    for b in range(256)
+)
+
+
+def _encode_part(part) -> bytes:
+    """Encode one command part as ASCII"""
+    kind = type(part)
+    if kind is str:
+        return part.encode('ascii')
+    if kind is int:
+        return b'%d' % part
+    if kind is bytes:
+        return part
+    return str(part).encode('ascii')
+
+
+def build_packet(*parts) -> bytes:
+    """Frame command parts as <SOH>part<CR>...<EOT>"""
+    packet = bytearray(SOH)
+    for part in parts:
+        packet += _encode_part(part)
+        packet += CR
+    packet += EOT
+    return bytes(packet)
+
+
+# Fixed commands, framed once; devices send them with send_packet
+ECHART_PACKET = build_packet(*build_echart_command())
+RESET_PACKET = build_packet(*build_reset_command())
+VERSION_PACKETS = (
+    ('software', build_packet(*build_version_command("PS"))),
+    ('controller', build_packet(*build_version_command("CV"))),
+)
+
+
+@lru_cache(maxsize=None)
+def chart_line_packet(line: int) -> bytes:
+    """Framed chart line command (validates line)"""
+    return build_packet(*build_chart_line_command(line))
+
+
+@lru_cache(maxsize=64)
+def pd_packet(value: float) -> bytes:
+    """Framed PD command (validates value)"""
+    return build_packet(*build_pd_command(value))
+
+
+def format_ascii(data: bytes) -> str:
+    """Format bytes as readable ASCII with special chars shown"""
+    return ''.join(map(_ASCII_TABLE.__getitem__, data))
+
+
+def enable_low_latency(ser, debug: bool = False):
+    """Drop an open port's adapter latency (FTDI defaults to 16 ms per read)"""
+    try:
+        ser.set_low_latency_mode(True)
+    except (AttributeError, NotImplementedError, OSError, ValueError) as e:
+        # Not available on Windows/macOS or on non-USB ports
+        if debug:
+            print(f"ℹ️  Low-latency mode not available: {e}")
+    else:
+        if debug:
+            print("✅ Low-latency mode enabled")
+    
+    if sys.platform.startswith('linux'):
+        set_latency_timer(ser.port, 1, debug)
+
+
+def set_latency_timer(port: str, ms: int, debug: bool = False):
+    """Set a USB-serial adapter's latency timer through sysfs (Linux)
+    
+    Needs write access to the sysfs attribute (root or a udev rule);
+    on Windows set it in Device Manager instead.
+    """
+    tty = os.path.basename(os.path.realpath(port))  # Follows /dev/serial/by-id links
+    path = f"/sys/bus/usb-serial/devices/{tty}/latency_timer"
+    try:
+        with open(path, 'w') as f:
+            f.write(str(ms))
+    except OSError as e:
+        # Not a USB-serial adapter, or no permission
+        if debug:
+            print(f"ℹ️  Latency timer not set: {e}")
+    else:
+        if debug:
+            print(f"✅ Latency timer set to {ms} ms")
 
 
 class CV5000Protocol:
     """Low-level ASCII protocol handler for CV-5000"""
     
     # Protocol constants
-    SOH = b'\x01'  # Start of Header
-    CR = b'\x0d'   # Carriage Return (delimiter)
-    EOT = b'\x04'  # End of Transmission
+    SOH = SOH
+    CR = CR
+    EOT = EOT
     
-    def __init__(self, port: str = "COM4", baudrate: int = 9600, timeout: float = 1.0):
+    def __init__(self, port: str = "COM4", baudrate: int = 9600, timeout: float = 1.0,
+                 low_latency: bool = True, command_interval: float = 0.05,
+                 settle_time: float = 0.2):
         """
         Initialize serial connection
         
@@ -22,12 +130,24 @@ class CV5000Protocol:
             port: Serial port (e.g., COM4, /dev/ttyUSB0)
             baudrate: Communication speed (default 9600)
             timeout: Read timeout in seconds
+            low_latency: Ask the USB-serial driver for low-latency mode on
+                connect (Linux only; ignored where unsupported)
+            command_interval: Minimum spacing between packets, giving the
+                device time to process each one
+            settle_time: Pause after opening the port; 0 skips it
         """
         self.port = port
         self.baudrate = baudrate
         self.timeout = timeout
+        self.low_latency = low_latency
+        self.command_interval = command_interval
+        self.settle_time = settle_time
+        self._next_write = 0.0  # time.monotonic() before which the next packet must wait
         self.ser: Optional[serial.Serial] = None
         self._debug = False
+        
+        self._rx_buf = bytearray(256)  # Responses are read into this, never reallocated
+        self._rx_carry = b''  # Bytes read past the last EOT: the start of the next response
     
     def connect(self):
         """Establish serial connection"""
@@ -40,7 +160,11 @@ class CV5000Protocol:
                 stopbits=serial.STOPBITS_ONE,
                 timeout=self.timeout
             )
-            time.sleep(0.2)  # Let port stabilize
+            self._rx_carry = b''
+            if self.low_latency:
+                enable_low_latency(self.ser, self._debug)
+            if self.settle_time:
+                time.sleep(self.settle_time)  # Let port stabilize
             
             if self._debug:
                 print(f"✅ Connected to {self.port} at {self.baudrate} baud")
@@ -69,82 +193,112 @@ class CV5000Protocol:
         Returns:
             Complete packet bytes
         """
-        packet = self.SOH
-        for part in parts:
-            packet += str(part).encode('ascii') + self.CR
-        packet += self.EOT
-        return packet
+        return build_packet(*parts)
     
-    def send_packet(self, packet: bytes, expect_response: bool = False) -> Optional[bytes]:
+    def send_packet(self, packet: bytes, expect_response: bool = False,
+                    flush: bool = True,
+                    parse: Optional[Callable[[bytearray, int], Any]] = None) -> Any:
         """
         Send a packet and optionally wait for response
         
         Args:
             packet: Raw packet bytes
             expect_response: Whether to wait for and return response
+            flush: Flush, and keep command_interval from the previous packet.
+                Pass False when the caller paces writes itself (e.g. a sweep
+                with a dwell)
+            parse: Called as parse(buffer, length) on the RX buffer instead
+                of copying the response out; must not keep the buffer
         
         Returns:
-            Response bytes if expect_response=True, else None
+            Response bytes (or parse's result) if expect_response=True, else None
         """
         if not self.is_connected():
             raise ConnectionError("Not connected to device")
         
         try:
+            # Give the device time to process the previous packet; unlike a
+            # fixed sleep after every write, a lone command goes out at once
+            if flush:
+                delay = self._next_write - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            
             # Send packet
             self.ser.write(packet)
-            self.ser.flush()
+            if flush:
+                self.ser.flush()
+            self._next_write = time.monotonic() + self.command_interval
             
             if self._debug:
                 print(f"TX: {packet.hex(' ').upper()}")
-                print(f"    {self._format_ascii(packet)}")
-            
-            # Wait for device to process
-            time.sleep(0.05)
+                print(f"    {format_ascii(packet)}")
             
             # Read response if expected
             if expect_response:
-                response = self.ser.read(256)  # Read up to 256 bytes
-                
-                if self._debug and response:
-                    print(f"RX: {response.hex(' ').upper()}")
-                    print(f"    {self._format_ascii(response)}")
-                
-                return response if response else None
+                with self._read_response() as response:
+                    if not response:
+                        return None
+                    if parse is not None:
+                        return parse(self._rx_buf, len(response))
+                    return bytes(response)
             
             return None
             
         except serial.SerialException as e:
             raise CommandError(f"Communication error: {e}")
     
-    def send_command(self, *parts, expect_response: bool = False) -> Optional[bytes]:
+    def _read_response(self) -> memoryview:
+        """Read a response into the RX buffer and return a view of it
+        
+        Returns as soon as EOT arrives (or on timeout) rather than waiting
+        out the timeout for a full buffer, and like ser.read_until(EOT) ends
+        the response at EOT; anything read past it is kept for the next
+        response. The view is only valid until the next read.
+        """
+        buf = self._rx_buf
+        view = memoryview(buf)
+        n = len(self._rx_carry)
+        view[:n] = self._rx_carry
+        self._rx_carry = b''
+        end = buf.find(EOT, 0, n)
+        deadline = time.monotonic() + self.timeout
+        while end < 0 and n < len(buf):
+            # Take whatever has arrived; otherwise block for one byte
+            size = min(max(self.ser.in_waiting, 1), len(buf) - n)
+            got = self.ser.readinto(view[n:n + size]) or 0
+            if not got:
+                break  # Timed out
+            end = buf.find(EOT, n, n + got)
+            n += got
+            if time.monotonic() >= deadline:
+                break
+        if end >= 0:
+            self._rx_carry = bytes(view[end + 1:n])
+            n = end + 1
+        view.release()
+        response = memoryview(buf)[:n]
+        
+        if self._debug and response:
+            print(f"RX: {response.hex(' ').upper()}")
+            print(f"    {format_ascii(response)}")
+        
+        return response
+    
+    def send_command(self, *parts, expect_response: bool = False,
+                     parse: Optional[Callable[[bytearray, int], Any]] = None) -> Any:
         """
         Build and send a command
         
         Args:
             *parts: Command parts
             expect_response: Whether to wait for response
+            parse: Response parser, see send_packet
         
         Returns:
-            Response bytes if expect_response=True
+            Response bytes (or parse's result) if expect_response=True
         """
-        packet = self.build_packet(*parts)
-        return self.send_packet(packet, expect_response)
-    
-    def _format_ascii(self, data: bytes) -> str:
-        """Format bytes as readable ASCII with special chars shown"""
-        result = []
-        for b in data:
-            if b == 0x01:
-                result.append('<SOH>')
-            elif b == 0x0d:
-                result.append('<CR>')
-            elif b == 0x04:
-                result.append('<EOT>')
-            elif 32 <= b <= 126:
-                result.append(chr(b))
-            else:
-                result.append(f'<{b:02X}>')
-        return ''.join(result)
+        return self.send_packet(build_packet(*parts), expect_response, parse=parse)
     
     def set_debug(self, enabled: bool):
         """Enable/disable debug output"""
@@ -0,0 +1,44 @@
+"""Cached CV-5000 device state"""
+
+from collections.abc import Mapping
+from dataclasses import dataclass, fields
+
+
+@dataclass(slots=True)
+class DeviceState(Mapping):
+    """
+    Last values sent to the device
+    
+    The device classes read and write fields as attributes; the read-only
+    Mapping interface (state['r_sph'], dict(state)) is what get_state()
+    callers see.
+    """
+    r_sph: float = 0.0
+    r_cyl: float = 0.0
+    r_axis: int = 0
+    l_sph: float = 0.0
+    l_cyl: float = 0.0
+    l_axis: int = 0
+    pd: float = 64.0
+    chart_line: int = 1
+    connected: bool = False
+    
+    def update(self, values: Mapping):
+        """Set several fields at once"""
+        for key, value in values.items():
+            setattr(self, key, value)
+    
+    def __getitem__(self, key: str):
+        if key not in _FIELD_SET:
+            raise KeyError(key)
+        return getattr(self, key)
+    
+    def __iter__(self):
+        return iter(_FIELDS)
+    
+    def __len__(self) -> int:
+        return len(_FIELDS)
+
+
+_FIELDS = tuple(f.name for f in fields(DeviceState))
+_FIELD_SET = frozenset(_FIELDS)
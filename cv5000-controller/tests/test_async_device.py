@@ -0,0 +1,82 @@
+"""AsyncCV5000Device tests against an in-memory serial transport"""
+
+import asyncio
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pytest
+
+from src.async_device import AsyncCV5000Device, _FrameProtocol
+from src.exceptions import TimeoutError
+
+PS_QUERY = b'\x01v\rPS\r\x04'
+CV_QUERY = b'\x01v\rCV\r\x04'
+PS_RESPONSE = b'\x01v\rPS\rV1.23\r\x04'
+CV_RESPONSE = b'\x01v\rCV\rV4.56\r\x04'
+
+
+class FakeTransport:
+    """Records writes and answers version queries from a script"""
+    
+    def __init__(self, protocol: _FrameProtocol, replies: dict):
+        self.protocol = protocol
+        self.replies = replies  # query packet -> list of responses, None = no answer
+        self.written = []
+    
+    def write(self, packet: bytes):
+        self.written.append(packet)
+        queue = self.replies.get(packet)
+        response = queue.pop(0) if queue else None
+        if response is not None:
+            asyncio.get_running_loop().call_soon(self.protocol.data_received, response)
+    
+    def is_closing(self) -> bool:
+        return False
+    
+    def close(self):
+        pass
+
+
+def make_device(replies: dict) -> AsyncCV5000Device:
+    device = AsyncCV5000Device(port="COM4", timeout=0.05, command_interval=0)
+    device._protocol = _FrameProtocol()
+    device._protocol.connection_made(FakeTransport(device._protocol, replies))
+    device._state.connected = True
+    return device
+
+
+def test_version_queries_matched_in_send_order():
+    device = make_device({PS_QUERY: [PS_RESPONSE], CV_QUERY: [CV_RESPONSE]})
+    versions = asyncio.run(device.get_version())
+    assert versions == {'software': 'V1.23', 'controller': 'V4.56'}
+
+
+def test_unanswered_query_does_not_shift_later_responses():
+    device = make_device({PS_QUERY: [None, PS_RESPONSE, PS_RESPONSE]})
+    
+    async def run():
+        with pytest.raises(TimeoutError):
+            await device._send_packet(PS_QUERY, expect_response=True)
+        assert not device._protocol.waiters
+        # Both following queries get their own response, not the one before
+        first = await device._send_packet(PS_QUERY, expect_response=True)
+        second = await device._send_packet(PS_QUERY, expect_response=True)
+        return first, second
+    
+    assert asyncio.run(run()) == (PS_RESPONSE, PS_RESPONSE)
+
+
+def test_frames_split_across_reads():
+    device = make_device({})
+    
+    async def run():
+        loop = asyncio.get_running_loop()
+        waiters = [loop.create_future(), loop.create_future()]
+        device._protocol.waiters.extend(waiters)
+        data = PS_RESPONSE + CV_RESPONSE
+        device._protocol.data_received(data[:5])
+        device._protocol.data_received(data[5:])
+        return [w.result() for w in waiters]
+    
+    assert asyncio.run(run()) == [PS_RESPONSE, CV_RESPONSE]
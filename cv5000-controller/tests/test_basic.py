@@ -5,6 +5,8 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from src.device import CV5000Device
+from src.commands import CommandBuilder
+from src.protocol import CV5000Protocol
 from src.exceptions import ValidationError
 import time
 
@@ -133,6 +135,42 @@ def test_validation():
         print(f"❌ Validation test failed: {e}")
         return False
 
+def test_prescription_packet():
+    """Test the templated prescription packet matches the generic builder"""
+    print("\n" + "=" * 60)
+    print("TEST: Prescription Packet Template")
+    print("=" * 60)
+    
+    try:
+        protocol = CV5000Protocol(port="COM4")
+        for params in [
+            {},
+            {'r_sph': -1.50, 'l_sph': -1.50},
+            {'r_sph': 2.25, 'r_cyl': -0.75, 'r_axis': 5,
+             'l_sph': -20.0, 'l_cyl': -6.0, 'l_axis': 180},
+        ]:
+            expected = protocol.build_packet(*CommandBuilder.build_prescription_command(**params))
+            assert CommandBuilder.build_prescription_packet(**params) == expected, \
+                f"Packet mismatch for {params}"
+            buf = bytearray(b"prefix")
+            length = CommandBuilder.build_prescription_into(buf, **params)
+            assert bytes(buf[6:]) == expected and length == len(expected), \
+                f"In-place packet mismatch for {params}"
+        print("✅ Templated and in-place packets match build_packet output")
+        
+        try:
+            CommandBuilder.build_prescription_packet(r_sph=-25.0)
+            print("❌ Should have rejected -25.0")
+            return False
+        except ValidationError:
+            print("✅ Template path still validates")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Packet template test failed: {e}")
+        return False
+
 def run_all_tests():
     """Run all basic tests"""
     print("\n" + "=" * 60)
@@ -143,7 +181,8 @@ def run_all_tests():
         "Connection": test_connection(),
         "Version Query": test_version_query(),
         "Reset": test_reset(),
-        "Validation": test_validation()
+        "Validation": test_validation(),
+        "Packet Template": test_prescription_packet()
     }
     
     # Summary
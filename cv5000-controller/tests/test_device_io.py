@@ -0,0 +1,138 @@
+"""CV5000Device serial I/O tests against an in-memory port"""
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pytest
+
+from src import protocol
+from src.commands import build_prescription_packet
+from src.device import CV5000Device
+from src.protocol import build_packet
+
+PS_QUERY = b'\x01v\rPS\r\x04'
+CV_QUERY = b'\x01v\rCV\r\x04'
+PS_RESPONSE = b'\x01v\rPS\rV1.23\r\x04'
+CV_RESPONSE = b'\x01v\rCV\rV4.56\r\x04'
+
+
+class FakeSerial:
+    """Records writes and plays back scripted responses
+    
+    ``replies`` maps a written packet to the bytes that become readable
+    after it; ``chunk`` caps how many bytes one read returns.
+    """
+    
+    def __init__(self, replies=None, chunk=None):
+        self.port = "COM4"
+        self.is_open = True
+        self.replies = replies or {}
+        self.chunk = chunk
+        self.written = []
+        self._rx = bytearray()
+    
+    def write(self, packet):
+        packet = bytes(packet)
+        self.written.append(packet)
+        self._rx += self.replies.get(packet, b'')
+    
+    def flush(self):
+        pass
+    
+    @property
+    def in_waiting(self):
+        return len(self._rx)
+    
+    def readinto(self, buf):
+        n = min(len(buf), len(self._rx), self.chunk or len(self._rx))
+        buf[:n] = self._rx[:n]
+        del self._rx[:n]
+        return n
+    
+    def close(self):
+        self.is_open = False
+
+
+@pytest.fixture
+def connect(monkeypatch):
+    """Return a function that connects a CV5000Device to a FakeSerial"""
+    devices = []
+    
+    def connect(port: FakeSerial, **kwargs) -> CV5000Device:
+        monkeypatch.setattr(protocol.serial, 'Serial', lambda **_: port)
+        device = CV5000Device(port="COM4", low_latency=False, **kwargs)
+        device.protocol.settle_time = 0
+        device.protocol.command_interval = 0
+        device.protocol.timeout = 0.05
+        device.connect()
+        devices.append(device)
+        return device
+    
+    yield connect
+    for device in devices:
+        device.disconnect()
+
+
+def rx_packet(**params) -> bytes:
+    """Expected B command for a prescription (unspecified fields zero)"""
+    full = dict.fromkeys(('r_sph', 'r_cyl', 'l_sph', 'l_cyl'), 0.0)
+    full.update(r_axis=0, l_axis=0)
+    full.update(params)
+    return build_prescription_packet(**full)
+
+
+def test_concatenated_responses_are_split_at_eot(connect):
+    # Both answers arrive in one read; the second is kept for the next query
+    port = FakeSerial({PS_QUERY: PS_RESPONSE + CV_RESPONSE})
+    device = connect(port)
+    assert device.get_version() == {'software': 'V1.23', 'controller': 'V4.56'}
+    assert port.written == [PS_QUERY, CV_QUERY]
+
+
+def test_response_split_across_reads(connect):
+    port = FakeSerial({PS_QUERY: PS_RESPONSE, CV_QUERY: CV_RESPONSE}, chunk=3)
+    device = connect(port)
+    assert device.get_version() == {'software': 'V1.23', 'controller': 'V4.56'}
+
+
+def test_missing_response_does_not_shift_the_next_one(connect):
+    port = FakeSerial({CV_QUERY: CV_RESPONSE})
+    device = connect(port)
+    assert device.get_version() == {'controller': 'V4.56'}
+
+
+def test_batch_sends_one_merged_prescription_on_exit(connect):
+    port = FakeSerial()
+    device = connect(port)
+    with device.batch():
+        device.set_prescription(r_sph=-1.00)
+        with device.batch():
+            device.set_prescription(l_sph=-1.25)
+        # The inner block's exit doesn't send
+        assert port.written == []
+        device.set_cylinder_both(-0.50)
+    assert port.written == [rx_packet(r_sph=-1.00, l_sph=-1.25, r_cyl=-0.50, l_cyl=-0.50)]
+
+
+def test_other_commands_in_a_batch_go_out_first(connect):
+    port = FakeSerial()
+    device = connect(port)
+    with device.batch():
+        device.set_prescription(r_sph=-1.00)
+        device.set_pd(62.0)
+    assert port.written == [build_packet('D', '62.0'), rx_packet(r_sph=-1.00)]
+
+
+def test_flush_sends_the_latest_coalesced_prescription(connect):
+    port = FakeSerial()
+    device = connect(port, coalesce_ms=60_000)
+    first = device.set_prescription(r_sph=-1.00, wait=False)
+    second = device.set_prescription(r_sph=-2.00, wait=False)
+    assert port.written == []
+    assert device.flush() is True
+    assert port.written == [rx_packet(r_sph=-2.00)]
+    # Both callers share the write that was sent
+    assert first is second
+    first.result(timeout=1)
+    assert device.flush() is False
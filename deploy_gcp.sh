@@ -90,6 +90,7 @@ echo ""
 echo "Copying project files to VM..."
 gcloud compute scp --zone=$ZONE --recurse \
     relay_server.py \
+    runtime.py \
     requirements.txt \
     $INSTANCE_NAME:~/
 
@@ -16,6 +16,7 @@ import base64
 from datetime import datetime
 import websockets
 from controller_websocket import ControllerWebSocket
+from runtime import run
 
 
 # Configuration
@@ -31,6 +32,8 @@ CHART_WIDTH = 100  # Approximate width of each chart item
 CHART_GAP = 8      # Gap between charts
 CHARTS_IN_ROW = 6  # Number of charts in row 1
 
+DECODE_CHUNK = 256 * 1024  # base64 chars per slice; a multiple of 4 so slices decode independently
+
 
 async def take_and_save_screenshot(controller, client_id, label):
     """Take a screenshot and save it with a label."""
@@ -42,9 +45,14 @@ async def take_and_save_screenshot(controller, client_id, label):
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]  # Include milliseconds
         filename = f"screenshot_{label}_{timestamp}.png"
         
-        # Decode and save
+        # Raw PNG bytes over binary transport, base64 over JSON-only transport;
+        # base64 is decoded slice by slice straight into the file
         with open(filename, 'wb') as f:
-            f.write(base64.b64decode(screenshot_data))
+            if isinstance(screenshot_data, str):
+                for start in range(0, len(screenshot_data), DECODE_CHUNK):
+                    f.write(base64.b64decode(screenshot_data[start:start + DECODE_CHUNK]))
+            else:
+                f.write(screenshot_data)
         
         print(f"     ✓ Saved: {filename}")
         return filename
@@ -221,4 +229,4 @@ async def main():
 
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    run(main())
@@ -8,12 +8,15 @@ to the hands (Windows client).
 from dataclasses import dataclass, field
 from typing import Optional, Dict, Any, Union
 
+from runtime import dumps
 
-@dataclass
+
+@dataclass(frozen=True)
 class ScreenshotConfig:
     """Configuration for screenshot capture."""
     before: bool = True
     after: bool = True
+    deferred: bool = False  # Keep screenshots on the client; results carry refs only
     
     @classmethod
     def from_value(cls, value: Union[bool, dict, None]):
@@ -22,7 +25,7 @@ class ScreenshotConfig:
         Args:
             value: Can be:
                 - bool: True = both, False = neither
-                - dict: {"before": bool, "after": bool}
+                - dict: {"before": bool, "after": bool, "deferred": bool}
                 - None: defaults to both True
         """
         if value is None:
@@ -32,7 +35,8 @@ class ScreenshotConfig:
         elif isinstance(value, dict):
             return cls(
                 before=value.get('before', True),
-                after=value.get('after', True)
+                after=value.get('after', True),
+                deferred=value.get('deferred', False)
             )
         else:
             raise ValueError(f"Invalid screenshot config: {value}")
@@ -41,62 +45,173 @@ class ScreenshotConfig:
         """Convert to dictionary for JSON serialization."""
         return {
             'before': self.before,
-            'after': self.after
+            'after': self.after,
+            'deferred': self.deferred
         }
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Action:
-    """A single action to execute on the remote client."""
+    """A single action to execute on the remote client.
+    
+    Actions are immutable; use ``dataclasses.replace`` to derive a variant.
+    """
     element: str  # Template name (e.g., "chart_e200")
     screenshot: ScreenshotConfig = field(default_factory=lambda: ScreenshotConfig())
     delay: float = 1.0  # Delay after action (seconds)
     index: int = 0  # Which match to click if multiple found (0-based, 0 = first/leftmost/topmost)
     button: str = 'left'  # Mouse button: 'left', 'right', or 'middle'
     offset: tuple = (0, 0)  # Pixel offset from matched position (x, y). Negative values move left/up.
+    depends_on_previous: bool = True  # False lets the previous action's delay be coalesced past this one
+    _cached_command: Optional[Dict[str, Any]] = field(default=None, init=False, repr=False, compare=False)
+    _cached_json: Optional[str] = field(default=None, init=False, repr=False, compare=False)
     
     def __init__(self, element: str, screenshot: Union[bool, dict, ScreenshotConfig, None] = None, 
-                 delay: float = 1.0, index: int = 0, button: str = 'left', offset: tuple = (0, 0)):
-        self.element = element
-        self.screenshot = screenshot if isinstance(screenshot, ScreenshotConfig) else ScreenshotConfig.from_value(screenshot)
-        self.delay = delay
-        self.index = index
-        self.button = button
-        self.offset = offset
+                 delay: float = 1.0, index: int = 0, button: str = 'left', offset: tuple = (0, 0),
+                 depends_on_previous: bool = True):
+        # Frozen, so fields are set through object.__setattr__; the screenshot
+        # config is normalized once here rather than on every send
+        if not isinstance(screenshot, ScreenshotConfig):
+            screenshot = ScreenshotConfig.from_value(screenshot)
+        object.__setattr__(self, 'element', element)
+        object.__setattr__(self, 'screenshot', screenshot)
+        object.__setattr__(self, 'delay', delay)
+        object.__setattr__(self, 'index', index)
+        object.__setattr__(self, 'button', button)
+        object.__setattr__(self, 'offset', offset)
+        object.__setattr__(self, 'depends_on_previous', depends_on_previous)
+        object.__setattr__(self, '_cached_command', None)
+        object.__setattr__(self, '_cached_json', None)
     
     def to_command(self) -> Dict[str, Any]:
-        """Convert to command dictionary for sending to client."""
-        return {
-            'action': 'click_element',
-            'element': self.element,
-            'screenshot': self.screenshot.to_dict(),
-            'index': self.index,
-            'button': self.button,
-            'offset': {'x': self.offset[0], 'y': self.offset[1]}
-        }
+        """Convert to command dictionary for sending to client.
+        
+        The dict is built once and reused; callers must copy it before
+        adding keys.
+        """
+        command = self._cached_command
+        if command is None:
+            command = {
+                'action': 'click_element',
+                'element': self.element,
+                'screenshot': self.screenshot.to_dict(),
+                'index': self.index,
+                'button': self.button,
+                'offset': {'x': self.offset[0], 'y': self.offset[1]}
+            }
+            object.__setattr__(self, '_cached_command', command)
+        return command
+    
+    def to_json(self) -> str:
+        """The command as a JSON object, serialized once and reused."""
+        command_json = self._cached_json
+        if command_json is None:
+            command_json = dumps(self.to_command())
+            object.__setattr__(self, '_cached_json', command_json)
+        return command_json
+    
+    def to_batch_command(self, delay: Optional[float] = None) -> Dict[str, Any]:
+        """Convert to a batch op; the client waits ``delay_ms`` before the next op.
+        
+        Args:
+            delay: Wait to send instead of ``self.delay`` (seconds)
+        """
+        if delay is None:
+            delay = self.delay
+        return dict(self.to_command(), delay_ms=int(delay * 1000))
 
 
-@dataclass
+class CompressedScreenshot:
+    """A zstd-compressed PNG as received over binary transport.
+    
+    Kept compressed until png() is first called, using the decompressor of
+    the connection it arrived on; ActionResult calls it when the screenshot
+    is first read.
+    """
+    __slots__ = ('_data', '_decompressor')
+    
+    def __init__(self, payload, decompressor):
+        self._data = payload
+        self._decompressor = decompressor
+    
+    def png(self) -> bytes:
+        """The PNG bytes, decompressed on the first call."""
+        if self._decompressor is not None:
+            self._data = self._decompressor.decompress(self._data)
+            self._decompressor = None
+        return self._data
+
+
+Screenshot = Union[bytes, str, CompressedScreenshot]
+
+
+@dataclass(slots=True)
 class ActionResult:
     """Result of executing an action."""
     success: bool
     action: Action
     clicked_at: Optional[tuple] = None
-    before_screenshot: Optional[str] = None  # base64 encoded
-    after_screenshot: Optional[str] = None   # base64 encoded
     error: Optional[str] = None
     execution_time: float = 0.0  # seconds
+    # Screenshot hashes; fetch deferred screenshots with ActionExecutor.fetch_screenshot
+    before_ref: Optional[str] = None
+    after_ref: Optional[str] = None
+    # Read through before_screenshot/after_screenshot
+    _before_screenshot: Optional[Screenshot] = field(default=None, repr=False)
+    _after_screenshot: Optional[Screenshot] = field(default=None, repr=False)
+    
+    def __init__(self, success: bool, action: Action, clicked_at: Optional[tuple] = None,
+                 before_screenshot: Optional[Screenshot] = None,
+                 after_screenshot: Optional[Screenshot] = None,
+                 error: Optional[str] = None, execution_time: float = 0.0,
+                 before_ref: Optional[str] = None, after_ref: Optional[str] = None):
+        self.success = success
+        self.action = action
+        self.clicked_at = clicked_at
+        self.error = error
+        self.execution_time = execution_time
+        self.before_ref = before_ref
+        self.after_ref = after_ref
+        self._before_screenshot = before_screenshot
+        self._after_screenshot = after_screenshot
+    
+    @property
+    def before_screenshot(self) -> Optional[Union[bytes, str]]:
+        """PNG bytes (base64 str over JSON-only transport), decompressed on first read."""
+        shot = self._before_screenshot
+        if isinstance(shot, CompressedScreenshot):
+            shot = self._before_screenshot = shot.png()
+        return shot
+    
+    @before_screenshot.setter
+    def before_screenshot(self, value: Optional[Screenshot]):
+        self._before_screenshot = value
+    
+    @property
+    def after_screenshot(self) -> Optional[Union[bytes, str]]:
+        """PNG bytes (base64 str over JSON-only transport), decompressed on first read."""
+        shot = self._after_screenshot
+        if isinstance(shot, CompressedScreenshot):
+            shot = self._after_screenshot = shot.png()
+        return shot
+    
+    @after_screenshot.setter
+    def after_screenshot(self, value: Optional[Screenshot]):
+        self._after_screenshot = value
     
     @classmethod
     def from_response(cls, response: Dict[str, Any], action: Action):
         """Create ActionResult from client response."""
+        data = response.get('data') or {}
         return cls(
             success=response.get('status') == 'success',
             action=action,
-            clicked_at=tuple(response['data']['clicked_at'].values()) if 'data' in response and 'clicked_at' in response['data'] else None,
-            before_screenshot=response['data'].get('before_screenshot') if 'data' in response else None,
-            after_screenshot=response['data'].get('after_screenshot') if 'data' in response else None,
-            error=response.get('message') if response.get('status') != 'success' else None
+            clicked_at=tuple(data['clicked_at'].values()) if 'clicked_at' in data else None,
+            before_screenshot=data.get('before_screenshot'),
+            after_screenshot=data.get('after_screenshot'),
+            error=response.get('message') if response.get('status') != 'success' else None,
+            before_ref=data.get('before_hash'),
+            after_ref=data.get('after_hash')
         )
     
     def __str__(self) -> str:
@@ -117,6 +232,7 @@ if __name__ == '__main__':
         Action("chart_e200", screenshot=True),  # Both screenshots
         Action("chart_e100", screenshot={"before": True, "after": False}),  # Only before
         Action("chart_e70", screenshot=False),  # No screenshots
+        Action("chart_e50", screenshot={"deferred": True}),  # Both, fetched on demand
     ]
     
     # Print commands
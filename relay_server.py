@@ -6,12 +6,13 @@ Clients and controllers connect to this server via WebSocket.
 """
 
 import asyncio
-import json
 import logging
 from datetime import datetime
-from typing import Dict, Set
+from typing import Dict, Optional, Set, Union
 import websockets
 
+from runtime import dumps as _dumps, loads as _loads, run
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -22,10 +23,28 @@ logger = logging.getLogger(__name__)
 # Configuration
 DEFAULT_HOST = '0.0.0.0'
 DEFAULT_PORT = 8123
+MAX_MESSAGE_SIZE = 2 ** 26  # 64 MiB; base64 screenshots easily exceed the 1 MiB default
 
 # Connected clients and controllers
 clients: Dict[str, any] = {}  # client_id -> websocket
 controllers: Set[any] = set()
+# Controller session (the req_id prefix before the last '-') -> websocket,
+# so responses and their binary frames go back only to the requester
+sessions: Dict[str, any] = {}
+
+
+def _session_of(req_id: Optional[str]) -> Optional[str]:
+    """Return the controller session a req_id belongs to, if any."""
+    if not req_id:
+        return None
+    return req_id.rpartition('-')[0] or None
+
+
+def _frame_req_id(frame: bytes) -> Optional[str]:
+    """Read the req_id a client prefixed to a binary frame (length byte + ASCII)."""
+    if not frame:
+        return None
+    return frame[1:1 + frame[0]].decode('ascii', errors='replace') or None
 
 
 class RelayServer:
@@ -38,7 +57,7 @@ class RelayServer:
     async def register_client(self, websocket, client_id: str):
         """Register a Windows client."""
         clients[client_id] = websocket
-        logger.info(f"Client registered: {client_id} from {websocket.remote_address}")
+        logger.info("Client registered: %s from %s", client_id, websocket.remote_address)
         
         # Notify all controllers about new client
         await self.broadcast_to_controllers({
@@ -51,7 +70,7 @@ class RelayServer:
         """Unregister a Windows client."""
         if client_id in clients:
             del clients[client_id]
-            logger.info(f"Client unregistered: {client_id}")
+            logger.info("Client unregistered: %s", client_id)
             
             # Notify controllers
             await self.broadcast_to_controllers({
@@ -63,68 +82,99 @@ class RelayServer:
     async def register_controller(self, websocket):
         """Register a controller."""
         controllers.add(websocket)
-        logger.info(f"Controller registered from {websocket.remote_address}")
+        logger.info("Controller registered from %s", websocket.remote_address)
         
-        # Send list of connected clients
-        await websocket.send(json.dumps({
+        # Send list of connected clients, and let the controller know it may
+        # merge several commands into one JSON array frame
+        await websocket.send(_dumps({
             'type': 'client_list',
             'clients': list(clients.keys()),
+            'features': ['command_arrays'],
             'timestamp': datetime.now().isoformat()
         }))
     
     async def unregister_controller(self, websocket):
         """Unregister a controller."""
         controllers.discard(websocket)
-        logger.info(f"Controller unregistered from {websocket.remote_address}")
+        for session in [s for s, ws in sessions.items() if ws is websocket]:
+            del sessions[session]
+        logger.info("Controller unregistered from %s", websocket.remote_address)
     
-    async def broadcast_to_controllers(self, message: dict):
-        """Send message to all connected controllers."""
+    async def broadcast_to_controllers(self, message: Union[dict, bytes]):
+        """Send message (or a raw binary frame) to all connected controllers."""
         if controllers:
-            message_str = json.dumps(message)
+            message_str = message if isinstance(message, bytes) else _dumps(message)
             await asyncio.gather(
                 *[controller.send(message_str) for controller in controllers],
                 return_exceptions=True
             )
     
+    async def send_to_requester(self, req_id: Optional[str], message: Union[dict, bytes]):
+        """Send a response (or binary frame) to the controller that sent req_id.
+        
+        Falls back to all controllers when the request isn't ours to route,
+        e.g. a response without a req_id.
+        """
+        controller = sessions.get(_session_of(req_id))
+        if controller is None:
+            await self.broadcast_to_controllers(message)
+            return
+        try:
+            await controller.send(message if isinstance(message, bytes) else _dumps(message))
+        except websockets.exceptions.ConnectionClosed:
+            pass
+    
     async def handle_client_message(self, websocket, message: dict, client_id: str):
         """Handle message from a Windows client (usually responses)."""
         # Client is sending a response to a command
-        # Forward it to all controllers
+        # Forward it to the controller that sent the command
         message['client_id'] = client_id
         message['timestamp'] = datetime.now().isoformat()
-        await self.broadcast_to_controllers(message)
-        logger.info(f"Forwarded response from client {client_id}: {message.get('type', 'unknown')}")
+        await self.send_to_requester(message.get('req_id'), message)
+        logger.info("Forwarded response from client %s: %s",
+                    client_id, message.get('type', 'unknown'))
     
     async def handle_controller_message(self, websocket, message: dict):
         """Handle message from a controller (usually commands)."""
         target_client_id = message.get('client_id')
         
+        # Errors echo the req_id so the controller can fail that request at once
         if not target_client_id:
-            await websocket.send(json.dumps({
+            await websocket.send(_dumps({
                 'type': 'error',
+                'status': 'error',
                 'message': 'No client_id specified',
+                'req_id': message.get('req_id'),
                 'timestamp': datetime.now().isoformat()
             }))
             return
         
         if target_client_id not in clients:
-            await websocket.send(json.dumps({
+            await websocket.send(_dumps({
                 'type': 'error',
+                'status': 'error',
                 'message': f'Client {target_client_id} not connected',
+                'req_id': message.get('req_id'),
                 'timestamp': datetime.now().isoformat()
             }))
             return
         
         # Forward command to target client
         target_websocket = clients[target_client_id]
+        session = _session_of(message.get('req_id'))
+        if session:
+            sessions[session] = websocket
         try:
-            await target_websocket.send(json.dumps(message))
-            logger.info(f"Forwarded command to client {target_client_id}: {message.get('action', 'unknown')}")
+            await target_websocket.send(_dumps(message))
+            logger.info("Forwarded command to client %s: %s",
+                        target_client_id, message.get('action', 'unknown'))
         except Exception as e:
-            logger.error(f"Failed to send to client {target_client_id}: {e}")
-            await websocket.send(json.dumps({
+            logger.error("Failed to send to client %s: %s", target_client_id, e)
+            await websocket.send(_dumps({
                 'type': 'error',
+                'status': 'error',
                 'message': f'Failed to send to client: {str(e)}',
+                'req_id': message.get('req_id'),
                 'timestamp': datetime.now().isoformat()
             }))
     
@@ -136,7 +186,15 @@ class RelayServer:
         try:
             # First message should identify the connection type
             async for message_str in websocket:
-                message = json.loads(message_str)
+                # Binary frames carry screenshots that follow a client's JSON
+                # response; pass them through untouched, in order, to the
+                # same controller as the response
+                if isinstance(message_str, bytes):
+                    if connection_type == 'client':
+                        await self.send_to_requester(_frame_req_id(message_str), message_str)
+                    continue
+                
+                message = _loads(message_str)
                 
                 # Handle registration
                 if connection_type is None:
@@ -144,13 +202,13 @@ class RelayServer:
                         connection_type = 'client'
                         client_id = message.get('client_id')
                         if not client_id:
-                            await websocket.send(json.dumps({
+                            await websocket.send(_dumps({
                                 'type': 'error',
                                 'message': 'client_id required'
                             }))
                             break
                         await self.register_client(websocket, client_id)
-                        await websocket.send(json.dumps({
+                        await websocket.send(_dumps({
                             'type': 'registered',
                             'client_id': client_id
                         }))
@@ -158,13 +216,13 @@ class RelayServer:
                     elif message.get('type') == 'register_controller':
                         connection_type = 'controller'
                         await self.register_controller(websocket)
-                        await websocket.send(json.dumps({
+                        await websocket.send(_dumps({
                             'type': 'registered',
                             'role': 'controller'
                         }))
                     
                     else:
-                        await websocket.send(json.dumps({
+                        await websocket.send(_dumps({
                             'type': 'error',
                             'message': 'First message must be registration'
                         }))
@@ -175,12 +233,14 @@ class RelayServer:
                     if connection_type == 'client':
                         await self.handle_client_message(websocket, message, client_id)
                     elif connection_type == 'controller':
-                        await self.handle_controller_message(websocket, message)
+                        # A controller may coalesce several commands into one array frame
+                        for command in (message if isinstance(message, list) else [message]):
+                            await self.handle_controller_message(websocket, command)
         
         except websockets.exceptions.ConnectionClosed:
-            logger.info(f"Connection closed: {websocket.remote_address}")
+            logger.info("Connection closed: %s", websocket.remote_address)
         except Exception as e:
-            logger.error(f"Error handling connection: {e}")
+            logger.error("Error handling connection: %s", e)
         finally:
             # Cleanup
             if connection_type == 'client' and client_id:
@@ -190,10 +250,12 @@ class RelayServer:
     
     async def start(self):
         """Start the WebSocket server."""
-        logger.info(f"Starting WebSocket relay server on {self.host}:{self.port}")
+        logger.info("Starting WebSocket relay server on %s:%s", self.host, self.port)
         
-        async with websockets.serve(self.handler, self.host, self.port):
-            logger.info(f"Server running on ws://{self.host}:{self.port}")
+        # permessage-deflate is negotiated by default; JSON and base64 frames shrink a lot
+        async with websockets.serve(self.handler, self.host, self.port,
+                                    compression='deflate', max_size=MAX_MESSAGE_SIZE):
+            logger.info("Server running on ws://%s:%s", self.host, self.port)
             logger.info("Waiting for clients and controllers to connect...")
             await asyncio.Future()  # Run forever
 
@@ -214,6 +276,6 @@ async def main():
 
 if __name__ == '__main__':
     try:
-        asyncio.run(main())
+        run(main())
     except KeyboardInterrupt:
         logger.info("Server stopped by user")
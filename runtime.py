@@ -0,0 +1,41 @@
+"""
+Runtime helpers shared by the relay, controller and client: event loop
+selection and wire JSON encoding
+"""
+
+import asyncio
+import json
+from typing import Any, Coroutine
+
+try:
+    import orjson
+    
+    def dumps(obj: Any) -> str:
+        """Encode obj as compact JSON text
+        
+        orjson returns bytes; decode so frames stay text frames.
+        Coordinates from OpenCV may be NumPy scalars.
+        """
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode('utf-8')
+    
+    loads = orjson.loads
+except ImportError:
+    def dumps(obj: Any) -> str:
+        """Encode obj as compact JSON text"""
+        return json.dumps(obj, separators=(',', ':'))
+    
+    loads = json.loads
+
+
+def run(main: Coroutine[Any, Any, Any]) -> Any:
+    """Run a coroutine to completion on a fresh event loop
+    
+    Uses uvloop's libuv event loop where available (not on Windows) and
+    asyncio's default loop otherwise.
+    """
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
+    return asyncio.run(main)
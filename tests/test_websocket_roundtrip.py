@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Round-trip Tests
+
+Runs a RelayServer in-process on a free port and connects real
+ControllerWebSocket instances to it. The Windows client is played by a
+bare websocket that answers commands from a script, so no display is
+needed.
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import asyncio
+import json
+
+import websockets
+
+import relay_server
+from controller_websocket import ControllerWebSocket
+from relay_server import RelayServer
+
+CLIENT_ID = 'test-client'
+
+
+class ScriptedClient:
+    """Registers as a Windows client and answers every command with
+    ``handler(command)`` as its data"""
+    
+    def __init__(self, url: str, handler):
+        self.url = url
+        self.handler = handler
+        self.commands = []
+        self._task = None
+    
+    async def start(self):
+        registered = asyncio.get_running_loop().create_future()
+        self._task = asyncio.create_task(self._run(registered))
+        await registered
+    
+    async def _run(self, registered):
+        async with websockets.connect(self.url) as ws:
+            await ws.send(json.dumps({'type': 'register_client', 'client_id': CLIENT_ID}))
+            await ws.recv()
+            registered.set_result(None)
+            async for frame in ws:
+                command = json.loads(frame)
+                self.commands.append(command)
+                await ws.send(json.dumps({
+                    'type': 'response',
+                    'req_id': command.get('req_id'),
+                    'status': 'success',
+                    'data': self.handler(command)
+                }))
+    
+    async def stop(self):
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+
+async def start_relay():
+    """Start a relay on a free port; returns (server, url)"""
+    relay_server.clients.clear()
+    relay_server.controllers.clear()
+    relay_server.sessions.clear()
+    server = await websockets.serve(RelayServer().handler, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    return server, f'ws://127.0.0.1:{port}'
+
+
+async def connect_controller(url: str) -> ControllerWebSocket:
+    # Base64 screenshots, so the scripted client can answer in plain JSON
+    controller = ControllerWebSocket(url, binary_screenshots=False)
+    assert await controller.connect()
+    return controller
+
+
+def run_session(scenario, handler):
+    """Run ``scenario(url, client)`` against a relay and scripted client"""
+    async def session():
+        server, url = await start_relay()
+        client = ScriptedClient(url, handler)
+        await client.start()
+        try:
+            return await scenario(url, client)
+        finally:
+            await client.stop()
+            server.close()
+            await server.wait_closed()
+    
+    return asyncio.run(session())
+
+
+def test_responses_are_routed_to_the_requesting_controller():
+    """Two controllers share a client; each only sees its own responses."""
+    def echo(command):
+        return {'req_id': command['req_id']}
+    
+    async def scenario(url, client):
+        first = await connect_controller(url)
+        second = await connect_controller(url)
+        try:
+            responses = await asyncio.gather(*(
+                controller.send_command(CLIENT_ID, {'action': 'get_position'})
+                for controller in (first, second, first, second)
+            ))
+        finally:
+            await first.disconnect()
+            await second.disconnect()
+        return first.session_id, second.session_id, responses
+    
+    first_id, second_id, responses = run_session(scenario, echo)
+    assert first_id != second_id
+    for session_id, response in zip((first_id, second_id) * 2, responses):
+        assert response['req_id'] == response['data']['req_id']
+        assert response['req_id'].startswith(f'{session_id}-')
+
+
+def test_screenshot_ref_is_resolved_from_the_cache():
+    """A screenshot sent once comes back from the controller's cache when
+    the client later sends only its hash."""
+    sent = []
+    
+    def handler(command):
+        sent.append(command)
+        if len(sent) == 1:
+            return {'before_screenshot': 'AAAA', 'before_hash': 'h1'}
+        return {'before_ref': 'h1'}
+    
+    async def scenario(url, client):
+        controller = await connect_controller(url)
+        try:
+            return [
+                (await controller.send_command(CLIENT_ID, {'action': 'click_element'}))['data']
+                for _ in range(2)
+            ]
+        finally:
+            await controller.disconnect()
+    
+    first, second = run_session(scenario, handler)
+    assert first['before_screenshot'] == 'AAAA'
+    assert second['before_screenshot'] == 'AAAA'
+    assert 'before_ref' not in second
+    # Served from the cache: the client was never asked for the image
+    assert [c['action'] for c in sent] == ['click_element', 'click_element']
+
+
+def test_unknown_screenshot_ref_is_fetched_from_the_client():
+    """A hash the controller doesn't hold is fetched with get_screenshot
+    before the response is delivered."""
+    def handler(command):
+        if command['action'] == 'get_screenshot':
+            return {'screenshot': 'BBBB', 'hash': command['ref']}
+        return {'before_ref': 'h-lost'}
+    
+    async def scenario(url, client):
+        controller = await connect_controller(url)
+        try:
+            response = await controller.send_command(CLIENT_ID, {'action': 'click_element'})
+            # Cached now, so a second lookup needs no round trip
+            cached = await controller.get_screenshot(CLIENT_ID, 'h-lost')
+        finally:
+            await controller.disconnect()
+        return response['data'], cached['data'], client.commands
+    
+    data, cached, commands = run_session(scenario, handler)
+    assert data['before_screenshot'] == 'BBBB'
+    assert cached['screenshot'] == 'BBBB'
+    assert [c['action'] for c in commands] == ['click_element', 'get_screenshot']
+    assert commands[1]['ref'] == 'h-lost'
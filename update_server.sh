@@ -36,24 +36,26 @@ fi
 echo "✓ Instance found"
 echo ""
 
-# Check if relay_server.py exists locally
-if [ ! -f "relay_server.py" ]; then
-    echo "❌ Error: relay_server.py not found in current directory"
-    echo "Make sure you're in the project directory"
-    exit 1
-fi
-
-echo "✓ relay_server.py found"
+# Check if relay_server.py and its runtime helpers exist locally
+for file in relay_server.py runtime.py; do
+    if [ ! -f "$file" ]; then
+        echo "❌ Error: $file not found in current directory"
+        echo "Make sure you're in the project directory"
+        exit 1
+    fi
+done
+
+echo "✓ relay_server.py and runtime.py found"
 echo ""
 
-# Copy updated file to server
-echo "Uploading relay_server.py to server..."
-gcloud compute scp relay_server.py \
+# Copy updated files to server
+echo "Uploading relay_server.py and runtime.py to server..."
+gcloud compute scp relay_server.py runtime.py \
     $INSTANCE_NAME:~/ \
     --zone=$ZONE \
     --project=$PROJECT_ID
 
-echo "✓ File uploaded"
+echo "✓ Files uploaded"
 echo ""
 
 # Restart the service
@@ -21,7 +21,7 @@ echo "  Zone: $ZONE"
 echo ""
 
 # Files to update
-FILES_TO_UPDATE=("relay_server.py" "requirements.txt")
+FILES_TO_UPDATE=("relay_server.py" "runtime.py" "requirements.txt")
 
 echo "Checking files..."
 for file in "${FILES_TO_UPDATE[@]}"; do
@@ -38,7 +38,7 @@ echo "Uploading files to server..."
 
 # Upload all files
 gcloud compute scp \
-    relay_server.py requirements.txt \
+    relay_server.py runtime.py requirements.txt \
     $INSTANCE_NAME:~/ \
     --zone=$ZONE \
     --project=$PROJECT_ID
@@ -7,8 +7,8 @@ Works across any network, even behind NAT/firewall.
 """
 
 import asyncio
-import json
 import sys
+import time
 import tkinter as tk
 from tkinter import scrolledtext
 from datetime import datetime
@@ -17,18 +17,46 @@ from typing import Dict, Any, Optional, Tuple
 import websockets
 import socket
 import os
-import base64
+import hashlib
 import io
+from collections import OrderedDict, deque
+from runtime import dumps as _dumps, loads as _loads
 try:
     import cv2
     import numpy as np
     OPENCV_AVAILABLE = True
 except ImportError:
     OPENCV_AVAILABLE = False
+try:
+    import pybase64 as base64  # SIMD-accelerated drop-in for the stdlib module
+except ImportError:
+    import base64
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
 
 # Configuration
 DEFAULT_SERVER_URL = 'ws://34.63.226.183:8765' #gcp uri given by vinay
 DEFAULT_CLIENT_ID = socket.gethostname()  # Use computer name as default ID
+SCREENSHOT_CACHE_SIZE = 16  # Must match the controller's screenshot cache size
+SCREENSHOT_STORE_SIZE = 32  # Recent captures kept for get_screenshot
+SCREENSHOT_MIRROR_SESSIONS = 8  # Controller sessions whose cache we mirror
+SCREENSHOT_KEYS = ('before_screenshot', 'after_screenshot', 'screenshot')
+ZSTD_LEVEL = 3  # PNG is already deflated, so favour speed over ratio
+MAX_MESSAGE_SIZE = 2 ** 26  # 64 MiB; base64 screenshots easily exceed the 1 MiB default
+
+
+def _tag_frame(req_id: Optional[str], payload: bytes) -> bytes:
+    """Prefix a binary frame with the req_id of the response it belongs to.
+    
+    Layout: one length byte, the ASCII req_id, then the payload. The relay
+    routes on it and the controller matches the frame to its header.
+    """
+    tag = (req_id or '').encode('ascii')
+    return bytes((len(tag),)) + tag + payload
+
 
 # PyAutoGUI safety settings
 pyautogui.FAILSAFE = True
@@ -56,6 +84,17 @@ class WindowsClientWebSocket:
         self.templates_dir = os.path.join(base_path, "templates")
         self.templates_cache = {}  # Cache loaded templates
         
+        # Per controller session, hashes of screenshots it already holds
+        self.sent_screenshots = OrderedDict()  # session_id -> OrderedDict of hashes
+        self.screenshot_store = OrderedDict()  # sha256 -> PNG bytes
+        
+        # Batches run one at a time, in arrival order; the head is running
+        self.batch_queue = deque()
+        
+        # Outgoing frames, drained in order by a single sender task per connection
+        self.send_queue = None
+        self.zstd_compressor = None  # One per connection, reused for every screenshot
+        
 
         
         # Create GUI
@@ -257,23 +296,30 @@ class WindowsClientWebSocket:
     
     async def _connect_to_server(self):
         """Connect to relay server and handle messages."""
+        sender = None
         try:
             self.log(f"Connecting to {self.server_url}...", "INFO")
             
-            async with websockets.connect(self.server_url) as websocket:
+            async with websockets.connect(self.server_url, compression='deflate',
+                                          max_size=MAX_MESSAGE_SIZE) as websocket:
                 self.websocket = websocket
                 
                 # Register as client
-                await websocket.send(json.dumps({
+                await websocket.send(_dumps({
                     'type': 'register_client',
                     'client_id': self.client_id
                 }))
                 
                 # Wait for registration confirmation
                 response = await websocket.recv()
-                response_data = json.loads(response)
+                response_data = _loads(response)
                 
                 if response_data.get('type') == 'registered':
+                    self.send_queue = asyncio.Queue()
+                    sender = asyncio.create_task(self._sender_loop(websocket, self.send_queue))
+                    if ZSTD_AVAILABLE:
+                        self.zstd_compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+                    
                     self.root.after(0, lambda: self.status_label.configure(
                         text="● Connected", fg='#44ff44'
                     ))
@@ -291,7 +337,7 @@ class WindowsClientWebSocket:
                                 websocket.recv(),
                                 timeout=1.0
                             )
-                            message = json.loads(message_str)
+                            message = _loads(message_str)
                             
                             # Handle command
                             self.root.after(0, lambda m=message: self._handle_command(m))
@@ -308,6 +354,10 @@ class WindowsClientWebSocket:
             ))
         finally:
             self.running = False
+            self.send_queue = None
+            self.zstd_compressor = None
+            if sender is not None:
+                sender.cancel()
             self.root.after(0, lambda: self.connect_button.configure(state='normal'))
             self.root.after(0, lambda: self.disconnect_button.configure(state='disabled'))
             self.root.after(0, lambda: self.url_entry.configure(state='normal'))
@@ -317,24 +367,207 @@ class WindowsClientWebSocket:
         action = message.get('action')
         self.log(f"Received command: {action}", "COMMAND")
         
+        if action == 'batch':
+            # A controller may send the next batch before this one finishes
+            self.batch_queue.append(message)
+            if len(self.batch_queue) == 1:
+                self._start_batch(message)
+            return
+        
         response = self._execute_command(message)
+        # Echo the request id so the controller can match pipelined responses
+        response['req_id'] = message.get('req_id')
+        self._send_response(response, message)
+    
+    def _start_batch(self, batch: Dict[str, Any]):
+        """Start running the batch at the head of the queue."""
+        ops = batch.get('ops', [])
+        self.log(f"Executing batch of {len(ops)} commands", "INFO")
+        if not ops:
+            self._finish_batch()
+            return
+        self._run_batch_op(batch, 0, [] if batch.get('reply') == 'bulk' else None)
+    
+    def _finish_batch(self):
+        """Drop the finished batch and start the next queued one, if any."""
+        self.batch_queue.popleft()
+        if self.batch_queue:
+            self._start_batch(self.batch_queue[0])
+    
+    def _run_batch_op(self, batch: Dict[str, Any], seq: int, results: Optional[list] = None):
+        """Execute one op of a batch, then schedule the next after its delay.
+        
+        Each result is sent as soon as the op finishes, tagged with its
+        ``seq`` index, so the controller can stream results over one frame.
+        
+        With ``reply: bulk`` the results are instead collected in ``results``
+        and sent as a single response once the last op has run.
         
-        # Send response back to server
+        The last op's delay is still honored before the next queued batch.
+        """
+        if not self.running:
+            self.batch_queue.clear()
+            return
+        
+        ops = batch.get('ops', [])
+        op = ops[seq]
+        self.log(f"Batch op {seq + 1}/{len(ops)}: {op.get('action')}", "COMMAND")
+        
+        start_time = time.perf_counter()
+        response = self._execute_command(op)
+        
+        if results is not None:
+            response['execution_time'] = time.perf_counter() - start_time
+            # Nested results can't be followed by binary frames; use base64
+            self._encode_screenshots(response, {})
+            results.append(response)
+            if seq + 1 == len(ops):
+                response = {
+                    'type': 'response',
+                    'status': 'success',
+                    'message': f'Completed batch of {len(ops)} commands',
+                    'req_id': batch.get('req_id'),
+                    'results': results
+                }
+                if not self._send_response(response, batch):
+                    self.batch_queue.clear()
+                    return
+        else:
+            response['req_id'] = batch.get('req_id')
+            response['seq'] = seq
+            if not self._send_response(response, batch):
+                self.batch_queue.clear()
+                return
+        
+        # Pace the batch locally via the Tk loop instead of a round-trip
+        delay_ms = int(op.get('delay_ms', 0))
+        if seq + 1 < len(ops):
+            self.root.after(delay_ms, self._run_batch_op, batch, seq + 1, results)
+        else:
+            self.root.after(delay_ms, self._finish_batch)
+    
+    def _dedupe_screenshots(self, response: Dict[str, Any], session_id: Optional[str]) -> list:
+        """Replace screenshots the controller already holds with a hash reference.
+        
+        The controller keeps an LRU cache of the last SCREENSHOT_CACHE_SIZE
+        screenshots it received, keyed by SHA-256. We mirror that LRU here, per
+        controller session, so a repeated frame is sent as ``<prefix>_ref``
+        instead of the payload.
+        
+        Returns the hashes the controller will touch once it receives the
+        response; pass them to _record_screenshots after handing it off.
+        """
+        data = response.get('data')
+        if not session_id or not data:
+            return []
+        
+        mirror = self.sent_screenshots.get(session_id, ())
+        digests = []
+        for prefix in ('before', 'after'):
+            digest = data.get(f'{prefix}_hash')
+            if not digest or not data.get(f'{prefix}_screenshot'):
+                continue
+            
+            if digest in mirror:
+                data[f'{prefix}_screenshot'] = None
+                data[f'{prefix}_ref'] = digest
+            digests.append(digest)
+        return digests
+    
+    def _record_screenshots(self, session_id: Optional[str], digests: list):
+        """Touch hashes in a session's mirror, as the controller does on receipt."""
+        if not digests:
+            return
+        mirror = self.sent_screenshots.get(session_id)
+        if mirror is None:
+            mirror = self.sent_screenshots[session_id] = OrderedDict()
+            if len(self.sent_screenshots) > SCREENSHOT_MIRROR_SESSIONS:
+                self.sent_screenshots.popitem(last=False)
+        self.sent_screenshots.move_to_end(session_id)
+        
+        for digest in digests:
+            mirror[digest] = True
+            mirror.move_to_end(digest)
+            if len(mirror) > SCREENSHOT_CACHE_SIZE:
+                mirror.popitem(last=False)
+    
+    def _encode_screenshots(self, response: Dict[str, Any],
+                            command: Dict[str, Any]) -> list:
+        """Prepare raw PNG screenshots in a response for the wire.
+        
+        If the controller asked for ``screenshot_transport: binary``, each
+        payload is pulled out of the JSON and returned as a binary frame
+        (zstd-compressed when requested and available) tagged with the
+        response's req_id; the header lists the data keys in ``binary`` so the
+        controller can reassemble them in order.
+        Otherwise payloads are base64-encoded in place, as before.
+        """
+        data = response.get('data')
+        if not data:
+            return []
+        
+        binary = command.get('screenshot_transport') == 'binary'
+        compressor = self.zstd_compressor
+        compress = binary and compressor is not None and command.get('compression') == 'zstd'
+        frames = []
+        keys = []
+        for key in SCREENSHOT_KEYS:
+            payload = data.get(key)
+            if not isinstance(payload, bytes):
+                continue
+            
+            if binary:
+                if compress:
+                    payload = compressor.compress(payload)
+                frames.append(_tag_frame(response.get('req_id'), payload))
+                keys.append(key)
+                data[key] = None
+            else:
+                data[key] = base64.b64encode(payload).decode('utf-8')
+        
+        if keys:
+            response['binary'] = keys
+            if compress:
+                response['compression'] = 'zstd'
+        return frames
+    
+    async def _sender_loop(self, websocket, send_queue: asyncio.Queue):
+        """Send queued responses in order, each JSON header with its binary frames."""
+        while True:
+            frames = await send_queue.get()
+            try:
+                for frame in frames:
+                    await websocket.send(frame)
+            except websockets.exceptions.ConnectionClosed:
+                return
+    
+    def _send_response(self, response: Dict[str, Any],
+                       command: Optional[Dict[str, Any]] = None) -> bool:
+        """Queue a response for the sender task and log the outcome.
+        
+        The Tk thread doesn't wait for the send itself; frames go out in
+        the order they were queued. Screenshots are only recorded as held by
+        the controller once the response has been handed to the sender.
+        """
+        command = command or {}
         try:
-            future = asyncio.run_coroutine_threadsafe(
-                self.websocket.send(json.dumps(response)),
-                self.loop
-            )
-            # Wait for send to complete (with timeout matching brain's 10s timeout)
-            future.result(timeout=10.0)
+            send_queue = self.send_queue
+            if send_queue is None:
+                raise ConnectionError("Not connected to server")
+            session_id = command.get('session_id')
+            digests = self._dedupe_screenshots(response, session_id)
+            frames = self._encode_screenshots(response, command)
+            self.loop.call_soon_threadsafe(send_queue.put_nowait, [_dumps(response)] + frames)
+            self._record_screenshots(session_id, digests)
         except Exception as e:
             self.log(f"Failed to send response: {e}", "ERROR")
-            return
+            return False
         
         if response['status'] == 'success':
             self.log(f"✓ {response['message']}", "SUCCESS")
         else:
             self.log(f"✗ {response['message']}", "ERROR")
+        return True
     
     def _execute_command(self, command: Dict[str, Any]) -> Dict[str, Any]:
         """Execute a command and return the result."""
@@ -353,6 +586,8 @@ class WindowsClientWebSocket:
                 return self._take_screenshot()
             elif action == 'click_element':
                 return self._click_element(command)
+            elif action == 'get_screenshot':
+                return self._get_screenshot(command)
             else:
                 return {
                     'type': 'response',
@@ -434,29 +669,20 @@ class WindowsClientWebSocket:
     
     def _take_screenshot(self) -> Dict[str, Any]:
         """Take a screenshot of the screen."""
-        import base64
-        import io
-        
         try:
-            # Take screenshot
-            screenshot = pyautogui.screenshot()
-            
-            # Convert to PNG bytes
-            img_buffer = io.BytesIO()
-            screenshot.save(img_buffer, format='PNG')
-            img_bytes = img_buffer.getvalue()
-            
-            # Encode to base64
-            img_base64 = base64.b64encode(img_bytes).decode('utf-8')
+            img_bytes, width, height = self._capture_png()
+            img_hash = self._store_screenshot(img_bytes)
             
+            # Raw PNG bytes; encoded for the wire in _send_response
             return {
                 'type': 'response',
                 'status': 'success',
                 'message': 'Screenshot captured',
                 'data': {
-                    'screenshot': img_base64,
-                    'width': screenshot.width,
-                    'height': screenshot.height
+                    'screenshot': img_bytes,
+                    'hash': img_hash,
+                    'width': width,
+                    'height': height
                 }
             }
         except Exception as e:
@@ -466,6 +692,64 @@ class WindowsClientWebSocket:
                 'message': f'Failed to take screenshot: {str(e)}'
             }
     
+    def _capture_png(self) -> Tuple[bytes, int, int]:
+        """Capture the screen as PNG bytes, returning (png, width, height)."""
+        screenshot = pyautogui.screenshot()
+        img_buffer = io.BytesIO()
+        screenshot.save(img_buffer, format='PNG')
+        return img_buffer.getvalue(), screenshot.width, screenshot.height
+    
+    def _capture_screenshot(self) -> Tuple[Optional[bytes], Optional[str]]:
+        """Capture raw PNG bytes and their SHA-256 hash, or (None, None) on failure.
+        
+        The bytes stay raw until send time, where they either go out as a
+        binary frame or get base64-encoded for JSON-only transport.
+        """
+        try:
+            img_bytes, _, _ = self._capture_png()
+        except Exception as e:
+            self.log(f"Failed to take screenshot: {e}", "WARNING")
+            return None, None
+        return img_bytes, self._store_screenshot(img_bytes)
+    
+    def _store_screenshot(self, img_bytes: bytes) -> str:
+        """Keep a capture for get_screenshot and return its SHA-256 hash."""
+        img_hash = hashlib.sha256(img_bytes).hexdigest()
+        self.screenshot_store[img_hash] = img_bytes
+        self.screenshot_store.move_to_end(img_hash)
+        if len(self.screenshot_store) > SCREENSHOT_STORE_SIZE:
+            self.screenshot_store.popitem(last=False)
+        return img_hash
+    
+    def _get_screenshot(self, command: Dict[str, Any]) -> Dict[str, Any]:
+        """Return a recent screenshot by hash (e.g. one deferred by click_element).
+        
+        With ``release`` the screenshot is dropped from the store once sent;
+        ``data: False`` only releases it, for a controller that already has it.
+        """
+        ref = command.get('ref')
+        if command.get('release'):
+            img_bytes = self.screenshot_store.pop(ref, None)
+        else:
+            img_bytes = self.screenshot_store.get(ref)
+        if img_bytes is None:
+            return {'type': 'response', 'status': 'error', 'message': f'Screenshot {ref} no longer available'}
+        
+        if command.get('data') is False:
+            return {
+                'type': 'response',
+                'status': 'success',
+                'message': 'Screenshot released',
+                'data': {'hash': ref}
+            }
+        
+        return {
+            'type': 'response',
+            'status': 'success',
+            'message': 'Screenshot retrieved',
+            'data': {'screenshot': img_bytes, 'hash': ref}
+        }
+    
     def _find_element_by_orb(self, template_name: str) -> Optional[Tuple[int, int]]:
         """Find element using ORB feature matching.
         
@@ -958,7 +1242,7 @@ class WindowsClientWebSocket:
         Args:
             command: {
                 'element': 'chart_e200',
-                'screenshot': {'before': True, 'after': False} or bool,
+                'screenshot': {'before': True, 'after': False, 'deferred': False} or bool,
                 'index': 0,  # Which match to click if multiple found (0-based)
                 'button': 'left'  # Mouse button: 'left', 'right', or 'middle'
             }
@@ -983,14 +1267,15 @@ class WindowsClientWebSocket:
                 'before': screenshot_config,
                 'after': screenshot_config
             }
+        # Deferred screenshots stay in the store; only their hashes are returned
+        deferred = screenshot_config.get('deferred', False)
         
         try:
             # Take before screenshot if requested
             before_screenshot = None
+            before_hash = None
             if screenshot_config.get('before', False):
-                screenshot_result = self._take_screenshot()
-                if screenshot_result['status'] == 'success':
-                    before_screenshot = screenshot_result['data']['screenshot']
+                before_screenshot, before_hash = self._capture_screenshot()
             
             # Strategy: Try to find all matches first if index > 0
             # This allows us to select specific instances
@@ -1011,6 +1296,7 @@ class WindowsClientWebSocket:
                         'message': f'Index {match_index} out of range. Found {len(all_matches)} matches (indices 0-{len(all_matches)-1})',
                         'data': {
                             'before_screenshot': before_screenshot,
+                            'before_hash': before_hash,
                             'after_screenshot': None
                         }
                     }
@@ -1028,6 +1314,7 @@ class WindowsClientWebSocket:
                     'message': f'Element not found: {element}',
                     'data': {
                         'before_screenshot': before_screenshot,
+                        'before_hash': before_hash,
                         'after_screenshot': None
                     }
                 }
@@ -1061,10 +1348,9 @@ class WindowsClientWebSocket:
             
             # Take after screenshot if requested
             after_screenshot = None
+            after_hash = None
             if screenshot_config.get('after', False):
-                screenshot_result = self._take_screenshot()
-                if screenshot_result['status'] == 'success':
-                    after_screenshot = screenshot_result['data']['screenshot']
+                after_screenshot, after_hash = self._capture_screenshot()
             
             button_text = f" ({button} click)" if button != 'left' else ""
             offset_text = f" with offset ({offset['x']}, {offset['y']})" if (offset.get('x', 0) != 0 or offset.get('y', 0) != 0) else ""
@@ -1074,8 +1360,10 @@ class WindowsClientWebSocket:
                 'message': f'Clicked element: {element}{button_text}{offset_text}' + (f' (match #{match_index})' if match_index > 0 else ''),
                 'data': {
                     'clicked_at': {'x': click_x, 'y': click_y},
-                    'before_screenshot': before_screenshot,
-                    'after_screenshot': after_screenshot
+                    'before_screenshot': None if deferred else before_screenshot,
+                    'before_hash': before_hash,
+                    'after_screenshot': None if deferred else after_screenshot,
+                    'after_hash': after_hash
                 }
             }
             